@@ -0,0 +1,163 @@
+"""Closed-form results for the queueing models, so that simulations are only needed where there is no formula.
+
+All functions use the parametrisation of the models: with n servers, jobs arrive at rate lambd / n and every server
+works at rate mu / n, so the load of each server is rho = lambd / (mu * n).
+
+- mmn_queue, mmn_queue2 (one FCFS line, n servers): M/M/1 and M/M/c (Erlang C) are exact, and so is M/G/1
+  (Pollaczek-Khinchine) for Weibull or Pareto service times; M/G/c uses the Allen-Cunneen approximation, scaling the
+  M/M/c waiting time by (1 + cs^2) / 2, where cs^2 is the squared coefficient of variation of the service time.
+- mmNNN_queue (a FCFS line per server), by dispatch policy:
+  random       -- each server is an M/G/1 queue with arrival rate lambd / n^2 (exact);
+  round-robin  -- each server sees Erlang-n interarrival times: E_n/M/1 is exact (GI/M/1 with the root sigma of
+                  sigma = A*(m (1 - sigma))), E_n/G/1 uses the Kingman / Allen-Cunneen approximation;
+  jsq          -- approximation: a job waits only if all servers are busy (probability Erlang C), and then behind
+                  the jobs of its own, balanced, queue, which gives Wq = C(c, A) / (m (1 - rho^c)) -- exact for one
+                  server and equal to M/M/c in heavy traffic;
+  power-of-d   -- the mean-field limit of the supermarket model (Mitzenmacher): the fraction of servers with at least
+                  i jobs is rho^((d^i - 1) / (d - 1)); exact as n grows, exponential service only.
+
+expected(model, params) picks the right formula and returns None where there is none.
+"""
+
+import math
+
+POLICIES = ('random', 'round-robin', 'jsq', 'power-of-d')
+
+
+def erlang_c(c, load):
+    """Probability that an arriving job waits in an M/M/c queue with offered load `load` (= arrival rate / service
+    rate of one server), computed through the numerically stable Erlang B recursion."""
+    if load >= c:
+        return 1.0
+    b = 1.0
+    for k in range(1, c + 1):
+        b = load * b / (k + load * b)
+    return b / (1 - load / c * (1 - b))
+
+
+def service_cv2(distribution='exp', shape=None):
+    """Squared coefficient of variation of the service time distributions of the variates module."""
+    if distribution == 'exp':
+        return 1.0
+    if distribution == 'weibull':
+        return math.gamma(1 + 2 / shape) / math.gamma(1 + 1 / shape) ** 2 - 1
+    if distribution == 'pareto':
+        return 1 / (shape * (shape - 2)) if shape > 2 else math.inf
+    raise ValueError(f"unknown distribution {distribution!r}")
+
+
+def _result(arrival, waiting, service_rate, utilisation, method, exact):
+    """W, Wq, L (by Little's law) and utilisation, with the name of the method used."""
+    w = waiting + 1 / service_rate
+    return {'W': w, 'Wq': waiting, 'L': arrival * w, 'utilisation': utilisation, 'method': method, 'exact': exact}
+
+
+def _unstable(utilisation, method):
+    return {'W': math.inf, 'Wq': math.inf, 'L': math.inf, 'utilisation': utilisation, 'method': method,
+            'exact': True}
+
+
+def mgc(arrival, service_rate, c, cv2=1.0):
+    """M/G/c with the given arrival rate, service rate per server and squared coefficient of variation."""
+    load = arrival / service_rate
+    rho = load / c
+    if c == 1:
+        method, exact = ('M/M/1', True) if cv2 == 1 else ('M/G/1 Pollaczek-Khinchine', True)
+    else:
+        method, exact = ('M/M/c Erlang C', True) if cv2 == 1 else ('M/G/c Allen-Cunneen', False)
+    if rho >= 1:
+        return _unstable(rho, method)
+    waiting = erlang_c(c, load) / (c * service_rate - arrival) * (1 + cv2) / 2
+    return _result(arrival, waiting, service_rate, rho, method, exact)
+
+
+def erlang_gi_m1(arrival, service_rate, k):
+    """E_k/M/1: interarrival times with mean 1 / arrival made of k exponential phases, each of rate arrival * k."""
+    rho = arrival / service_rate
+    if rho >= 1:
+        return _unstable(rho, 'E_k/M/1')
+    phase_rate = arrival * k
+    sigma = 0.0  # the root in (0, 1) of sigma = (phase_rate / (phase_rate + service_rate * (1 - sigma))) ** k
+    for _ in range(10_000):
+        previous = sigma
+        sigma = (phase_rate / (phase_rate + service_rate * (1 - sigma))) ** k
+        if abs(sigma - previous) < 1e-15:
+            break
+    waiting = sigma / (service_rate * (1 - sigma))
+    return _result(arrival, waiting, service_rate, rho, 'E_k/M/1', True)
+
+
+def kingman(arrival, service_rate, ca2, cs2):
+    """GI/G/1 waiting time approximation with squared coefficients of variation ca2 and cs2."""
+    rho = arrival / service_rate
+    if rho >= 1:
+        return _unstable(rho, 'GI/G/1 Kingman')
+    waiting = rho / (1 - rho) * (ca2 + cs2) / 2 / service_rate
+    return _result(arrival, waiting, service_rate, rho, 'GI/G/1 Kingman', False)
+
+
+def jsq(arrival, service_rate, c, cv2=1.0):
+    """Join-the-shortest-queue approximation (see the module documentation)."""
+    load = arrival / service_rate
+    rho = load / c
+    if rho >= 1:
+        return _unstable(rho, 'JSQ approximation')
+    waiting = erlang_c(c, load) / (service_rate * (1 - rho ** c)) * (1 + cv2) / 2
+    return _result(arrival, waiting, service_rate, rho, 'JSQ approximation', c == 1 and cv2 == 1)
+
+
+def power_of_d(arrival, service_rate, c, d):
+    """Mean-field limit of power-of-d dispatching to c servers, exponential service."""
+    per_server = arrival / c
+    rho = per_server / service_rate
+    if rho >= 1:
+        return _unstable(rho, 'power-of-d mean field')
+    if d == 1:
+        return mgc(per_server, service_rate, 1)
+    jobs, i = 0.0, 1
+    while True:
+        term = rho ** ((d ** i - 1) / (d - 1))
+        jobs += term
+        if term < 1e-15 or i > 64:
+            break
+        i += 1
+    w = jobs / per_server
+    return {'W': w, 'Wq': w - 1 / service_rate, 'L': arrival * w, 'utilisation': rho,
+            'method': 'power-of-d mean field', 'exact': False}
+
+
+def expected(model, params):
+    """The analytical results for a model and its parameters (as in replication.MODELS, plus optional
+    service_dist and shape), or None if there is no formula for them."""
+    if model not in ('mmn_queue', 'mmn_queue2', 'mmNNN_queue'):
+        return None
+    lambd, mu, n = params['lambd'], params['mu'], params['n']
+    arrival, service_rate = lambd / n, mu / n
+    cv2 = service_cv2(params.get('service_dist', 'exp'), params.get('shape'))
+    if model in ('mmn_queue', 'mmn_queue2'):
+        return mgc(arrival, service_rate, n, cv2)
+    if model == 'mmNNN_queue':
+        policy = params.get('policy', 'round-robin')
+        if policy in ('random', 'round-robin'):
+            # every server is a separate queue: solve one, then count the jobs of all n
+            if policy == 'random':
+                theory = mgc(arrival / n, service_rate, 1, cv2)
+            elif cv2 == 1:
+                theory = erlang_gi_m1(arrival / n, service_rate, n)
+            else:
+                theory = kingman(arrival / n, service_rate, 1 / n, cv2)
+            return dict(theory, L=theory['L'] * n)
+        if policy == 'jsq':
+            return jsq(arrival, service_rate, n, cv2)
+        if policy == 'power-of-d' and cv2 == 1:
+            return power_of_d(arrival, service_rate, n, params.get('d', 2))
+    return None
+
+
+def describe(theory):
+    """A one-line description of an expected() result, for the command line scripts."""
+    if theory is None:
+        return "Theoretical expectation: no formula for this configuration"
+    kind = 'exact' if theory['exact'] else 'approximation'
+    return (f"Theoretical expectation ({theory['method']}, {kind}): W = {theory['W']:.4f}, "
+            f"L = {theory['L']:.3f}, utilisation = {theory['utilisation']:.3f}")
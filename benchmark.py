@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+"""Benchmarks for the simulation kernel and the models.
+
+event-queue: the classic "hold" model. The event set is filled with `size` pending events, then every operation pops
+the earliest one and pushes a new one at its time plus an exponential increment, so the number of pending events
+stays constant. The events/second figure is the number of hold operations (one pop plus one push) per second.
+
+servers: events/second of mmn_queue2 as the number of servers grows. The horizon is scaled with n (arrival and
+service rates are divided by n in that model), so every size processes about the same number of events.
+
+events: memory per pending event and mmn_queue2 throughput. Memory is measured with tracemalloc for an event queue
+holding `count` slotted Completion events, against the same events with a per-instance __dict__ (the representation
+used before events had __slots__); throughput is measured with and without the event pool.
+
+startup: wall-clock time of launching Python processes that import sir and run a tiny headless SIR simulation,
+against a bare interpreter; startup dominates batches of thousands of short runs.
+
+suite: the reproducible benchmark suite. Every case of SUITE (hold-model event queues, mmn_queue, mmn_queue2 and
+mmNNN_queue across lambda and n, sir across population sizes, launches of headless sir.py processes) runs with a
+fixed seed in a fresh process, so that its peak RSS is its own, and reports events/second, peak RSS and time to
+result (best of --repeat runs). Results can be saved as a JSON baseline and compared with a stored one; cases more
+than --tolerance worse on any metric are flagged and make the command exit with status 1:
+
+    python benchmark.py suite --save baseline.json
+    python benchmark.py suite --compare baseline.json
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import mmn_queue2
+from discrete_event_sim_V01 import EVENT_QUEUES, EventQueue
+
+
+def hold_benchmark(queue_name, size, operations, seed=1):
+    """Events/second of the `queue_name` backend with `size` pending events."""
+
+    rng = random.Random(seed)
+    queue = EVENT_QUEUES[queue_name]()
+    for _ in range(size):
+        t = rng.expovariate(1)
+        queue.push(t, t)  # the "event" is its own timestamp
+    start = time.perf_counter()
+    for _ in range(operations):
+        t = queue.pop()
+        t += rng.expovariate(1)
+        queue.push(t, t)
+    return operations / (time.perf_counter() - start)
+
+
+def servers_benchmark(n, lambd=0.9, mu=1, horizon=20_000, seed=1):
+    """Events/second of mmn_queue2 with n servers (about 2 * lambd * horizon events)."""
+
+    random.seed(seed)
+    sim = mmn_queue2.MMN(lambd, mu, n)
+    start = time.perf_counter()
+    sim.run(horizon * n)
+    elapsed = time.perf_counter() - start
+    events = 2 * sim.stats.sojourn.count + sim.stats.in_system  # completions + arrivals
+    return events / elapsed
+
+
+class DictCompletion:
+    """mmn_queue2.Completion as it was before __slots__, for comparison."""
+
+    def __init__(self, job_id, server):
+        self.id = job_id
+        self.server = server
+
+
+def bytes_per_event(cls, count):
+    """Memory allocated per event for an EventQueue holding `count` events of class cls."""
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = EventQueue()
+    for i in range(count):
+        event = cls(i, 0)
+        event.priority = float(i)
+        queue.push(event, event.priority)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return allocated / count
+
+
+def pool_benchmark(pool, lambd=0.9, mu=1, n=10, horizon=20_000, seed=1):
+    """Events/second of mmn_queue2 with or without the event pool."""
+
+    random.seed(seed)
+    sim = mmn_queue2.MMN(lambd, mu, n)
+    if pool:
+        sim.enable_event_pool()
+    start = time.perf_counter()
+    sim.run(horizon * n)
+    return (2 * sim.stats.sojourn.count + sim.stats.in_system) / (time.perf_counter() - start)
+
+
+def launch_time(arguments, launches=10):
+    """Average wall-clock seconds of running the Python interpreter with the given arguments, in this directory."""
+
+    command = [sys.executable, *arguments]
+    start = time.perf_counter()
+    for _ in range(launches):
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return (time.perf_counter() - start) / launches
+
+
+HEADLESS_SIR = ['sir.py', '--no-plot', '--population', '100', '--seed', '1']
+
+
+def processed_events(sim):
+    """The number of events sim has processed: every event processed was pushed, and the others are still queued."""
+    return sim.event_queue.seq - len(sim.event_queue)
+
+
+def hold_case(queue, size, operations=200_000):
+    hold_benchmark(queue, size, operations)
+    return operations
+
+
+def mmn_case(module, lambd, n, horizon, mu=1, **kwargs):
+    import importlib
+    sim = importlib.import_module(module).MMN(lambd, mu, n, **kwargs)
+    sim.run(horizon)
+    return processed_events(sim)
+
+
+def sir_case(population, infected=10):
+    import sir
+    sim = sir.SIR(population, infected, 1, 1 / 3, 1)
+    sim.run()
+    return processed_events(sim)
+
+
+def startup_case(launches=20):
+    launch_time(HEADLESS_SIR, launches)
+    return launches  # the "events" of this case are process launches
+
+
+# name -> (function, keyword arguments); the function runs the case and returns the number of events processed
+SUITE = {
+    'hold-heap-1k': (hold_case, {'queue': 'heap', 'size': 1_000}),
+    'hold-heap-100k': (hold_case, {'queue': 'heap', 'size': 100_000}),
+    'hold-calendar-1k': (hold_case, {'queue': 'calendar', 'size': 1_000}),
+    'hold-calendar-100k': (hold_case, {'queue': 'calendar', 'size': 100_000}),
+    'mmn_queue-0.5': (mmn_case, {'module': 'mmn_queue', 'lambd': 0.5, 'n': 1, 'horizon': 100_000}),
+    'mmn_queue-0.9': (mmn_case, {'module': 'mmn_queue', 'lambd': 0.9, 'n': 1, 'horizon': 100_000}),
+    'mmn_queue2-0.5-n2': (mmn_case, {'module': 'mmn_queue2', 'lambd': 0.5, 'n': 2, 'horizon': 200_000}),
+    'mmn_queue2-0.9-n2': (mmn_case, {'module': 'mmn_queue2', 'lambd': 0.9, 'n': 2, 'horizon': 200_000}),
+    'mmn_queue2-0.9-n100': (mmn_case, {'module': 'mmn_queue2', 'lambd': 0.9, 'n': 100, 'horizon': 10_000_000}),
+    'mmNNN_queue-0.9-n10': (mmn_case, {'module': 'mmNNN_queue', 'lambd': 0.9, 'n': 10, 'horizon': 1_000_000}),
+    'mmNNN_queue-0.9-n10-jsq': (mmn_case, {'module': 'mmNNN_queue', 'lambd': 0.9, 'n': 10, 'horizon': 1_000_000,
+                                           'policy': 'jsq'}),
+    'mmNNN_queue-0.9-n100-jsq': (mmn_case, {'module': 'mmNNN_queue', 'lambd': 0.9, 'n': 100, 'horizon': 10_000_000,
+                                            'policy': 'jsq'}),
+    'sir-1k': (sir_case, {'population': 1_000}),
+    'sir-10k': (sir_case, {'population': 10_000}),
+    'sir-100k': (sir_case, {'population': 100_000}),
+    'sir-startup': (startup_case, {}),
+}
+
+# metric -> True if larger is better
+METRICS = {'events_per_s': True, 'seconds': False, 'peak_rss_mb': False}
+
+
+def run_case(name, seed=1):
+    """Run one case of SUITE in this process and return its metrics."""
+
+    function, kwargs = SUITE[name]
+    random.seed(seed)
+    start = time.perf_counter()
+    events = function(**kwargs)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        peak_rss /= 1024
+    return {'events': events, 'seconds': elapsed, 'events_per_s': events / elapsed, 'peak_rss_mb': peak_rss / 1024}
+
+
+def run_suite(names, repeat=3, seed=1):
+    """The best result of `repeat` runs of each case, every run in a new process."""
+
+    results = {}
+    context = multiprocessing.get_context('spawn')  # a fresh interpreter, not a copy of this one's memory
+    for name in names:
+        runs = []
+        for _ in range(repeat):
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+                runs.append(executor.submit(run_case, name, seed).result())
+        best = {metric: (max if larger else min)(run[metric] for run in runs) for metric, larger in METRICS.items()}
+        results[name] = {'events': runs[0]['events'], **best}
+        print(f"{name:<26}{best['events_per_s']:>14,.0f}{best['seconds']:>10.3f}{best['peak_rss_mb']:>10.1f}",
+              flush=True)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """(case, metric, baseline value, new value) for every metric more than `tolerance` (relative) worse."""
+
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, larger in METRICS.items():
+            old, new = baseline[name][metric], result[metric]
+            if (new < old * (1 - tolerance)) if larger else (new > old * (1 + tolerance)):
+                found.append((name, metric, old, new))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    queues = subparsers.add_parser('event-queue', help="push/pop throughput of the event-set backends")
+    queues.add_argument('--queues', nargs='+', choices=EVENT_QUEUES, default=list(EVENT_QUEUES))
+    queues.add_argument('--sizes', type=int, nargs='+', default=[10, 1_000, 100_000, 1_000_000])
+    queues.add_argument('--operations', type=int, default=200_000)
+    servers = subparsers.add_parser('servers', help="mmn_queue2 throughput as the number of servers grows")
+    servers.add_argument('--n', type=int, nargs='+', default=[2, 10, 100, 1_000, 10_000])
+    servers.add_argument('--lambd', type=float, default=0.9)
+    servers.add_argument('--horizon', type=float, default=20_000)
+    events = subparsers.add_parser('events', help="memory per pending event and throughput with the event pool")
+    events.add_argument('--count', type=int, default=100_000)
+    events.add_argument('--horizon', type=float, default=20_000)
+    startup = subparsers.add_parser('startup', help="process startup time of headless sir.py runs")
+    startup.add_argument('--launches', type=int, default=20)
+    suite = subparsers.add_parser('suite', help="the reproducible benchmark suite, with JSON baselines")
+    suite.add_argument('--cases', nargs='+', choices=SUITE, default=list(SUITE))
+    suite.add_argument('--repeat', type=int, default=3, help="runs of each case; the best is kept")
+    suite.add_argument('--seed', type=int, default=1)
+    suite.add_argument('--save', help="write the results to this JSON file")
+    suite.add_argument('--compare', help="JSON file of a baseline to compare the results with")
+    suite.add_argument('--tolerance', type=float, default=0.1, help="relative change flagged as a regression")
+    args = parser.parse_args()
+
+    if args.benchmark == 'event-queue':
+        print(f"{'pending':>10} " + ' '.join(f'{name:>12}' for name in args.queues) + '  (events/s)')
+        for size in args.sizes:
+            rates = [hold_benchmark(name, size, args.operations) for name in args.queues]
+            print(f'{size:>10} ' + ' '.join(f'{rate:>12,.0f}' for rate in rates))
+    elif args.benchmark == 'servers':
+        print(f"{'servers':>10} {'events/s':>12}")
+        for n in args.n:
+            print(f'{n:>10} {servers_benchmark(n, args.lambd, horizon=args.horizon):>12,.0f}')
+    elif args.benchmark == 'events':
+        print(f"bytes per pending event: {bytes_per_event(DictCompletion, args.count):.0f} with __dict__, "
+              f"{bytes_per_event(mmn_queue2.Completion, args.count):.0f} with __slots__")
+        for pool in (False, True):
+            rate = pool_benchmark(pool, horizon=args.horizon)
+            print(f"mmn_queue2 events/s {'with' if pool else 'without'} the event pool: {rate:,.0f}")
+    elif args.benchmark == 'startup':
+        bare = launch_time(['-c', 'pass'], args.launches)
+        imported = launch_time(['-c', 'import sir'], args.launches)
+        run = launch_time(HEADLESS_SIR, args.launches)
+        print(f"python: {bare * 1000:.0f} ms, import sir: +{(imported - bare) * 1000:.0f} ms, "
+              f"headless sir.py run: +{(run - bare) * 1000:.0f} ms")
+    elif args.benchmark == 'suite':
+        print(f"{'case':<26}{'events/s':>14}{'seconds':>10}{'RSS MB':>10}")
+        results = run_suite(args.cases, args.repeat, args.seed)
+        if args.save is not None:
+            with open(args.save, 'w') as f:
+                json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                           'seed': args.seed, 'results': results}, f, indent=2)
+        if args.compare is not None:
+            with open(args.compare) as f:
+                baseline = json.load(f)['results']
+            found = regressions(results, baseline, args.tolerance)
+            for name, metric, old, new in found:
+                print(f"REGRESSION {name}: {metric} {old:.4g} -> {new:.4g} ({new / old - 1:+.1%})")
+            if not found:
+                print(f"no regressions beyond {args.tolerance:.0%} against {args.compare}")
+            sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Checkpoint and restore of a whole simulation.
+
+A snapshot holds the simulation object (clock, event queue, model state, statistics, NumPy variate streams) and the
+state of the random module's generator, pickled and zlib-compressed. Snapshots are written to a temporary file and
+renamed, so a run killed while writing one still has the previous snapshot intact.
+
+Restoring a snapshot and running on gives exactly the same results as the uninterrupted run, as long as the model
+only draws random numbers from the random module or from samplers stored in the simulation. A snapshot can also be
+restored many times, with a different seed each time, to explore what-if continuations of a single warmed-up run.
+
+Tracers are not saved (they hold open files): attach a new one after restoring.
+"""
+
+import os
+import pickle
+import random
+import zlib
+
+from discrete_event_sim_V01 import BaseEvent
+
+
+def save_snapshot(sim, path):
+    """Write a snapshot of sim (and of the random module's state) to path."""
+    data = zlib.compress(pickle.dumps((sim, random.getstate()), pickle.HIGHEST_PROTOCOL), 1)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def load_snapshot(path, seed=None):
+    """Return the simulation saved in path and restore the random module's state.
+
+    If seed is given, the simulation is reseeded instead (see reseed()), which starts a different continuation of the
+    same run.
+    """
+    with open(path, 'rb') as f:
+        sim, random_state = pickle.loads(zlib.decompress(f.read()))
+    random.setstate(random_state)
+    if seed is not None:
+        reseed(sim, seed)
+    return sim
+
+
+def reseed(sim, seed):
+    """Reseed the random module and the NumPy samplers held by sim: every attribute with a reseed(rng) method, such
+    as variates.BlockSampler, gets a generator derived from seed (shared, as the samplers of a VariateStream are)."""
+    random.seed(seed)
+    reseedable = [value for value in vars(sim).values() if hasattr(value, 'reseed')]
+    if reseedable:
+        import numpy as np  # only when needed: sir.py imports this module and should start fast
+
+        rng = np.random.default_rng(random.getrandbits(64))  # seed may be a string, as in sir.py
+        for value in reseedable:
+            value.reseed(rng)
+
+
+class Checkpoint(BaseEvent):
+    """Save a snapshot of the simulation every `interval` time units.
+
+    Schedule it with Simulation.schedule_daemon, so that it stops with the model instead of keeping the run alive.
+    """
+    __slots__ = ('interval', 'path')
+
+    def __init__(self, interval, path):
+        self.interval = interval
+        self.path = path
+
+    def process(self, sim):
+        sim.schedule(self.interval, self)  # before saving, so that restored runs keep checkpointing
+        save_snapshot(sim, self.path)
+
+
+def add_checkpoint_arguments(parser):
+    """Add the --checkpoint, --checkpoint-every and --restore options shared by the command line scripts."""
+    parser.add_argument('--checkpoint', help="file in which to save periodic snapshots of the simulation")
+    parser.add_argument('--checkpoint-every', type=float, default=10_000, help="simulated time between snapshots")
+    parser.add_argument('--restore', help="continue the run saved in this snapshot instead of starting a new one")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Contact graphs in CSR (compressed sparse row) form, for SIR on networks.
+
+The neighbours of node v are indices[indptr[v]:indptr[v + 1]], so picking a random neighbour is O(1). A graph is
+stored on disk as a directory holding indptr.npy and indices.npy; load() memory-maps them read-only, so opening even
+a graph with hundreds of millions of edges takes no time, only the pages that are touched are read, and processes
+that open the same graph (e.g. parallel replications) share those pages through the OS page cache.
+
+Command line:
+
+    python contact_graph.py convert edges.txt graph/     # whitespace-separated "u v" lines, undirected
+    python contact_graph.py random 100000 10 graph/      # Erdos-Renyi graph with average degree 10
+"""
+
+import argparse
+import os
+import random
+
+import numpy as np
+
+
+class CSRGraph:
+
+    def __init__(self, indptr, indices, directory=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.n = len(indptr) - 1
+        self.directory = directory  # where the graph was loaded from, if it is memory-mapped
+
+    def __reduce__(self):
+        # a memory-mapped graph is pickled (e.g. in a checkpoint) as a reference to its directory, not as a copy
+        if self.directory is not None:
+            return CSRGraph.load, (self.directory,)
+        return CSRGraph, (self.indptr, self.indices)
+
+    def degree(self, v):
+        return int(self.indptr[v + 1] - self.indptr[v])
+
+    def neighbours(self, v):
+        return self.indices[self.indptr[v]:self.indptr[v + 1]]
+
+    def random_neighbour(self, v):
+        """A uniformly chosen neighbour of v, or None if v has none."""
+        start = int(self.indptr[v])
+        degree = int(self.indptr[v + 1]) - start
+        if degree == 0:
+            return None
+        return int(self.indices[start + random.randrange(degree)])
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'indptr.npy'), self.indptr)
+        np.save(os.path.join(directory, 'indices.npy'), self.indices)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Open a graph written by save(); with the default mmap_mode the arrays are read-only memory maps."""
+        return cls(np.load(os.path.join(directory, 'indptr.npy'), mmap_mode=mmap_mode),
+                   np.load(os.path.join(directory, 'indices.npy'), mmap_mode=mmap_mode),
+                   directory if mmap_mode is not None else None)
+
+    @classmethod
+    def from_edges(cls, sources, targets, n=None, directed=False):
+        """Build a graph from arrays of edge endpoints; undirected edges are stored in both directions.
+
+        Node ids go from 0 to n - 1; n defaults to the largest id plus one.
+        """
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        if not directed:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+        if n is None:
+            n = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        for ids in (sources, targets):
+            bad = ids[(ids < 0) | (ids >= n)]
+            if len(bad):
+                raise ValueError(f"node id {bad[0]} out of range for a graph of {n} nodes")
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        index_type = np.int32 if n < 2 ** 31 else np.int64
+        return cls(indptr, targets[order].astype(index_type))
+
+
+def random_graph(n, average_degree, rng=None):
+    """An Erdos-Renyi-like random graph: n * average_degree / 2 undirected edges between uniform random nodes."""
+    rng = rng if rng is not None else np.random.default_rng()
+    edges = int(n * average_degree / 2)
+    return CSRGraph.from_edges(rng.integers(n, size=edges), rng.integers(n, size=edges), n)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help="convert a text edge list to the binary CSR format")
+    convert.add_argument('edges', help="file of 'source target' lines")
+    convert.add_argument('directory')
+    convert.add_argument('--directed', action='store_true')
+    generate = subparsers.add_parser('random', help="generate a random graph")
+    generate.add_argument('n', type=int)
+    generate.add_argument('average_degree', type=float)
+    generate.add_argument('directory')
+    generate.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        edges = np.loadtxt(args.edges, dtype=np.int64, ndmin=2)
+        graph = CSRGraph.from_edges(edges[:, 0], edges[:, 1], directed=args.directed)
+    else:
+        graph = random_graph(args.n, args.average_degree, np.random.default_rng(args.seed))
+    graph.save(args.directory)
+    print(f"{graph.n} nodes, {len(graph.indices)} directed edges written to {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,155 @@
 # importing the needed libraries for implementing the queueing system
-import logging
+import collections
 import heapq
-
-# This will configure the logger to print log messages at the "info" level to the console.
-logging.basicConfig(level=logging.INFO)
+import logging
+import time
 
 
 class EventQueue:
+    """Binary heap of (priority, sequence number, event) entries.
+
+    The sequence number breaks ties between events scheduled at the same time, so they are processed in the order in
+    which they were scheduled and Event objects are never compared with each other.
+    """
+
     def __init__(self):  # constructor method, initialize the attributes of the class when an object is created from it.
         self.queue = []
+        self.seq = 0  # incremented on every push, used as tie-breaker
 
     def push(self, event, priority):  # add event function
-        heapq.heappush(self.queue, (priority, event))
+        self.seq += 1
+        heapq.heappush(self.queue, (priority, self.seq, event))
 
     def pop(self):  # pull event function
-        return heapq.heappop(self.queue)[1]
+        return heapq.heappop(self.queue)[2]
+
+    def peek_priority(self):
+        """The priority of the next event, without removing it."""
+        return self.queue[0][0]
 
     def is_empty(self):
         return len(self.queue) == 0
 
+    def __len__(self):
+        return len(self.queue)
+
+    def print_events(self):
+        for event in sorted(self.queue):
+            print(event[2])  # event[2] is the event object, event[0] is the priority and event[1] the tie-breaker
+
+
+class CalendarQueue:
+    """Calendar queue (R. Brown, 1988): amortised O(1) push and pop.
+
+    Events are hashed by time into "days" of length `width`. Each day with pending events has a bucket, an unsorted
+    list of (priority, sequence number, event) entries, in the `days` dictionary (rather than in a circular array of
+    buckets, which would mix the days of different "years"), so push() is an append. Only the entries of the current
+    day are kept in order, in a binary heap (`current`). When that day is over, the next day holding entries becomes
+    the current one: peek_priority() moves to it and pop() takes the result, so the days are walked once per day, not
+    once per event. The day length is re-estimated from the spacing of the earliest events whenever the number of
+    pending events has doubled or halved, so days hold a few dozen entries on average. Events at the same time fall on
+    the same day and come out in the order in which they were pushed, as with EventQueue.
+    """
+
+    DAY_EVENTS = 24  # the number of events a day should hold on average
+
+    def __init__(self, width=1.0):
+        self.size = 0
+        self.seq = 0
+        self._setup(width, [])
+
+    def _setup(self, width, entries):
+        """Spread entries over days of the given width, the current day being that of the earliest one."""
+        self.width = width
+        self.grow_at = max(2 * len(entries), 32)
+        self.shrink_at = len(entries) // 2
+        self.day = min(entries)[0] // width if entries else 0.0  # the current day, as a whole float
+        self.current = []  # heap of the entries of the current day, or earlier
+        self.days = collections.defaultdict(list)  # day -> bucket, for the days after the current one
+        for entry in entries:
+            day = entry[0] // width
+            if day <= self.day:
+                self.current.append(entry)
+            else:
+                self.days[day].append(entry)
+        heapq.heapify(self.current)
+
+    def push(self, event, priority):
+        self.seq = seq = self.seq + 1
+        day = priority // self.width
+        if day <= self.day:
+            heapq.heappush(self.current, (priority, seq, event))
+        else:
+            self.days[day].append((priority, seq, event))
+        self.size += 1
+        if self.size > self.grow_at:
+            self._resize()
+
+    def pop(self):
+        if not self.current:
+            self._next_day()
+        self.size -= 1
+        return heapq.heappop(self.current)[2]
+
+    def peek_priority(self):
+        """The priority of the next event, without removing it."""
+        if not self.current:
+            self._next_day()
+        return self.current[0][0]
+
+    def _next_day(self):
+        """Move to the next day holding entries, and make them the current heap."""
+        if not self.size:
+            raise IndexError('empty calendar queue')
+        if self.size < self.shrink_at:  # checked once a day rather than at every pop
+            self._resize()
+            if self.current:  # the resize found entries on the new current day
+                return
+        days = self.days
+        day = self.day
+        for _ in range(8):  # the next day holding entries is usually close: try a few
+            day += 1
+            if day in days:
+                break
+        else:  # otherwise jump straight to it
+            day = min(days)
+        bucket = days.pop(day)
+        heapq.heapify(bucket)
+        self.current = bucket
+        self.day = day
+
+    def is_empty(self):
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
     def print_events(self):
-        for event in self.queue:
-            print(event[1])  # event[1] is the event object, event[0] is the priority
+        for entry in sorted(self._entries()):
+            print(entry[2])
+
+    def _entries(self):
+        return self.current + [entry for bucket in self.days.values() for entry in bucket]
+
+    def _resize(self):
+        entries = self._entries()
+        self._setup(self._estimate_width(entries) or self.width, entries)
+
+    @classmethod
+    def _estimate_width(cls, entries):
+        """DAY_EVENTS times the average separation of the earliest events, ignoring outliers (Brown's heuristic) and
+        events at the same time, which would make the days too short when many events share a time."""
+        sample = [entry[0] for entry in heapq.nsmallest(min(len(entries), 25), entries)]
+        gaps = [b - a for a, b in zip(sample, sample[1:]) if b > a]
+        if not gaps:
+            return None
+        average = sum(gaps) / len(gaps)
+        gaps = [gap for gap in gaps if gap <= 2 * average]
+        return cls.DAY_EVENTS * sum(gaps) / len(gaps)
+
+
+# event-set backends that can be selected by name when creating a Simulation
+EVENT_QUEUES = {'heap': EventQueue, 'calendar': CalendarQueue}
 
 
 class Simulation:
@@ -30,49 +158,166 @@ class Simulation:
     Here, self.t is the simulated time and self.events is the event queue.
     """
 
-    def __init__(self):
+    def __init__(self, event_queue='heap', tracer=None):
         """Extend this method with the needed initialization.
 
-        You can call super().__init__() there to call the code here.
+        You can call super().__init__() there to call the code here. event_queue is either the name of one of the
+        EVENT_QUEUES backends or an already built queue object with the same push/pop/is_empty interface. tracer, if
+        given, receives trace records (see the tracing module).
         """
         self.t = 0  # simulated time
-        self.event_queue = EventQueue()  # set up self.events as an empty queue
+        if isinstance(event_queue, str):
+            event_queue = EVENT_QUEUES[event_queue]()
+        self.event_queue = event_queue  # set up self.events as an empty queue
+        self.tracer = tracer  # if not None, receives (time, kind, ids...) trace records; see the tracing module
+        self.free_events = None  # if not None, the event pool: event class -> list of processed events to reuse
+        self.profiler = None  # if not None, run() records per-event-type timings in it; see the profiler module
+        self.daemons = 0  # periodic events that don't keep the run alive, see schedule_daemon
 
     def schedule(self, delay, event):
         """Add an event to the event queue after the required delay."""
         event.priority = self.t + delay
         self.event_queue.push(event, event.priority)  # add event to the queue at time self.t + delay
 
-    def run(self, max_t=float('inf')):
+    def schedule_daemon(self, delay, event):
+        """Schedule a daemon: a periodic event, such as a checkpoint, that should not keep the simulation running.
+
+        run() ends as soon as only daemons are left in the queue, without processing them, so the clock stays at the
+        time of the last model event. A daemon is scheduled with this method once; when processed, it must schedule
+        itself again with schedule(), so that exactly one instance of it is always pending.
+        """
+        self.daemons += 1
+        self.schedule(delay, event)
+
+    def run(self, max_t=float('inf'), stop=None, check_every=1000):
         """Run the simulation. If max_t is specified, stop it at that time. If max_t is not specified, it defaults to infinity
-        which means it will run until the event queue is empty """
-        while not self.event_queue.is_empty():  # as long as the event queue is not empty
-            event = self.event_queue.pop()
-            if self.t > max_t:
+        which means it will run until the event queue is empty
+
+        Events scheduled after max_t are not processed: they stay in the queue and the clock is set to max_t, so the
+        run can be continued later with a larger max_t. The run also ends when only daemons (see schedule_daemon) are
+        left. If stop is given, stop(self) is called every check_every events and the run ends as soon as it returns
+        True (see the steady_state module).
+        """
+        if self.profiler is not None:
+            return self._run_profiled(max_t, stop, check_every)
+        queue = self.event_queue
+        free_events = self.free_events
+        countdown = check_every
+        while len(queue) > self.daemons:  # as long as there are events other than daemons
+            if queue.peek_priority() > max_t:
+                self.t = max_t
+                break
+            event = queue.pop()
+            self.t = event.priority
+            event.process(self)
+            if free_events is not None and event.recyclable:
+                free_events[type(event)].append(event)
+            if stop is not None:
+                countdown -= 1
+                if not countdown:
+                    if stop(self):
+                        break
+                    countdown = check_every
+
+    def _run_profiled(self, max_t, stop, check_every):
+        """The loop of run(), timing every event for self.profiler. Kept separate so that run() pays nothing for
+        profiling when it is off."""
+        queue = self.event_queue
+        free_events = self.free_events
+        profiler = self.profiler
+        clock = time.perf_counter
+        countdown = check_every
+        started = profiler.run_started()
+        while len(queue) > self.daemons:
+            if queue.peek_priority() > max_t:
+                self.t = max_t
                 break
+            queue_size = len(queue)
+            event = queue.pop()
             self.t = event.priority
+            start = clock()
             event.process(self)
+            profiler.event(type(event).__name__, start, clock() - start, self.t, queue_size)
+            if free_events is not None and event.recyclable:
+                free_events[type(event)].append(event)
+            if stop is not None:
+                countdown -= 1
+                if not countdown:
+                    if stop(self):
+                        break
+                    countdown = check_every
+        profiler.run_finished(started)
+
+    def enable_event_pool(self):
+        """Recycle processed events of the classes that allow it (recyclable = True) in new_event()."""
+        self.free_events = collections.defaultdict(list)
+
+    def new_event(self, cls, *args):
+        """cls(*args), reusing a processed event of class cls if the event pool is enabled and has one."""
+        if self.free_events is not None:
+            free = self.free_events[cls]
+            if free:
+                event = free.pop()
+                event.__init__(*args)
+                return event
+        return cls(*args)
+
+    def __getstate__(self):
+        """Used by pickle (see the checkpoint module): the tracer (which holds open files) and the profiler (which
+        measures this process) are left out."""
+        state = self.__dict__.copy()
+        state['tracer'] = None
+        state['profiler'] = None
+        return state
 
     def log_info(self, msg):
         logging.info(f'{self.t:.2f}: {msg}')
 
+    def trace(self, kind, *ids):
+        """Send a trace record to the tracer, if any. Hot paths should test `sim.tracer is not None` themselves
+        before calling this, to avoid even the method call when tracing is off."""
+        if self.tracer is not None:
+            self.tracer.record(self.t, kind, *ids)
+
 
-class Event:
+class BaseEvent:
     """
     Subclass this to represent your events.
 
-    You may need to define __init__ to set up all the necessary information.
+    You may need to define __init__ to set up all the necessary information. Events use __slots__ to stay small (no
+    per-instance __dict__): subclasses should list their own attributes in __slots__ too. Subclasses whose instances
+    are never scheduled again after being processed can set recyclable = True, so that Simulation.new_event can reuse
+    them when the event pool is enabled.
     """
+    __slots__ = ('priority',)  # the time at which the event is scheduled, set by Simulation.schedule
+    recyclable = False
+
+    def process(self, sim1):
+        raise NotImplementedError
+
+
+class Event(BaseEvent):
+    """An event that just calls a function: Event(name, duration, callback).
+
+    This was the event base class before BaseEvent, and still works as one: subclasses that don't define __slots__
+    get a per-instance __dict__ as before.
+    """
+    __slots__ = ('name', 'duration', 'callback')
+
     def __init__(self, name, duration, callback):
         self.name = name
         self.duration = duration
         self.callback = callback
-        # self.priority = None
 
     def process(self, sim1):
-        sim1.log_info(f'Started {self.name}')
+        if sim1.tracer is not None:
+            sim1.tracer.record(sim1.t, 'start ' + self.name)
         self.callback()
-        sim1.log_info(f'Ended {self.name}')
+        if sim1.tracer is not None:
+            sim1.tracer.record(sim1.t, 'end ' + self.name)
+
+
+CallbackEvent = Event
 
 
 def my_callback():
@@ -0,0 +1,110 @@
+"""Load-balancing policies for the multi-queue model (mmNNN_queue).
+
+A dispatcher chooses the server of every arriving job. The model calls choose() on each arrival, and update() every
+time the number of jobs at a server (queued plus running) changes, so that dispatchers that need the queue lengths
+can keep their own index instead of scanning the n servers.
+"""
+
+import random
+
+
+class Dispatcher:
+    """Base class: subclass it and define choose()."""
+
+    def __init__(self, n):
+        self.n = n
+
+    def choose(self, lengths):
+        """The server for the next job; lengths[i] is the number of jobs at server i."""
+        raise NotImplementedError
+
+    def update(self, server, length):
+        """The number of jobs at `server` is now `length`."""
+
+
+class RandomDispatcher(Dispatcher):
+    """Each job goes to a server chosen uniformly at random."""
+
+    def choose(self, lengths):
+        return random.randrange(self.n)
+
+
+class RoundRobinDispatcher(Dispatcher):
+    """Servers are chosen in turn: 0, 1, ..., n - 1, 0, 1, ..."""
+
+    def __init__(self, n):
+        super().__init__(n)
+        self.next = 0
+
+    def choose(self, lengths):
+        server = self.next
+        self.next = server + 1 if server + 1 < self.n else 0
+        return server
+
+
+class PowerOfDDispatcher(Dispatcher):
+    """Power of d choices (the "supermarket model"): sample d servers at random, with replacement, and pick the
+    one with the fewest jobs."""
+
+    def __init__(self, n, d=2):
+        super().__init__(n)
+        self.d = d
+
+    def choose(self, lengths):
+        n = self.n
+        best = random.randrange(n)
+        for _ in range(self.d - 1):
+            server = random.randrange(n)
+            if lengths[server] < lengths[best]:
+                best = server
+        return best
+
+
+class JSQDispatcher(Dispatcher):
+    """Join the shortest queue, ties broken at random, in O(1) per arrival.
+
+    Servers are kept in buckets indexed by their number of jobs, with the position of each server in its bucket, so
+    that moving a server to the next or previous bucket is a swap-and-pop. Lengths only change by one at a time, so
+    the index of the lowest non-empty bucket can be maintained incrementally.
+    """
+
+    def __init__(self, n):
+        super().__init__(n)
+        self.buckets = [list(range(n))]  # buckets[k] are the servers with k jobs
+        self.position = list(range(n))  # index of each server in its bucket
+        self.length = [0] * n
+        self.shortest = 0  # lowest k such that buckets[k] is not empty
+
+    def choose(self, lengths):
+        bucket = self.buckets[self.shortest]
+        return bucket[random.randrange(len(bucket))]
+
+    def update(self, server, length):
+        old = self.length[server]
+        if length == old:
+            return
+        # remove server from its bucket by moving the last server of the bucket in its place
+        bucket = self.buckets[old]
+        last = bucket.pop()
+        if last != server:
+            bucket[self.position[server]] = last
+            self.position[last] = self.position[server]
+        if length == len(self.buckets):
+            self.buckets.append([])
+        bucket = self.buckets[length]
+        self.position[server] = len(bucket)
+        bucket.append(server)
+        self.length[server] = length
+        if length < self.shortest:
+            self.shortest = length
+        elif old == self.shortest and not self.buckets[old]:
+            self.shortest = length
+
+
+# dispatchers that can be selected by name; the value builds the dispatcher from (n, d)
+DISPATCHERS = {
+    'random': lambda n, d: RandomDispatcher(n),
+    'round-robin': lambda n, d: RoundRobinDispatcher(n),
+    'jsq': lambda n, d: JSQDispatcher(n),
+    'power-of-d': PowerOfDDispatcher,
+}
@@ -0,0 +1,86 @@
+"""Per-job traces of the MMN models, written as append-only binary columns.
+
+When a JobTraceWriter is attached to a model (sim.job_trace = JobTraceWriter('trace/')), every completed job is
+recorded with its id, arrival time, start of service, completion time and server. Records are buffered in typed arrays
+and every `chunk_size` jobs each column is appended to its own file of little-endian values in the trace directory:
+
+    job.bin         int64
+    arrival.bin     float64
+    start.bin       float64
+    completion.bin  float64
+    server.bin      int32
+
+so the files can be memory-mapped as NumPy arrays while the run is still going (see trace_analysis.py). columns.json
+describes the columns, and once the writer is closed it also holds the number of jobs.
+
+Jobs are recorded in the order in which they complete. Writers can be pickled with the simulation: a run restored from
+a checkpoint rewrites the columns from the point where the snapshot was taken.
+"""
+
+import json
+import os
+from array import array
+
+# column name -> (array typecode, NumPy dtype)
+COLUMNS = {
+    'job': ('q', '<i8'),
+    'arrival': ('d', '<f8'),
+    'start': ('d', '<f8'),
+    'completion': ('d', '<f8'),
+    'server': ('i', '<i4'),
+}
+
+
+class JobTraceWriter:
+
+    def __init__(self, directory, chunk_size=65_536):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+        self.written = 0  # jobs already in the files
+        os.makedirs(directory, exist_ok=True)
+        for name in COLUMNS:
+            open(self._path(name), 'wb').close()
+        self._write_metadata(None)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + '.bin')
+
+    def _write_metadata(self, jobs):
+        with open(os.path.join(self.directory, 'columns.json'), 'w') as f:
+            json.dump({'columns': {name: dtype for name, (_, dtype) in COLUMNS.items()}, 'jobs': jobs}, f)
+
+    def record(self, job_id, arrival, start, completion, server):
+        buffers = self.buffers
+        buffers['job'].append(job_id)
+        buffers['arrival'].append(arrival)
+        buffers['start'].append(start)
+        buffers['completion'].append(completion)
+        buffers['server'].append(server)
+        if len(buffers['job']) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered records to the column files."""
+        count = len(self.buffers['job'])
+        if not count:
+            return
+        for name, buffer in self.buffers.items():
+            with open(self._path(name), 'r+b') as f:
+                f.seek(self.written * buffer.itemsize)  # anything past this was written after a restored snapshot
+                buffer.tofile(f)
+                f.truncate()
+            del buffer[:]
+        self.written += count
+
+    def close(self):
+        self.flush()
+        self._write_metadata(self.written)
+
+    def __len__(self):
+        return self.written + len(self.buffers['job'])
+
+
+def add_job_trace_arguments(parser):
+    """Add the --job-trace option of the MMN scripts."""
+    parser.add_argument('--job-trace', help="directory in which to record every job (see trace_analysis.py)")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Non-event-driven engine for FCFS queues with one shared waiting line: the Lindley and Kiefer-Wolfowitz recursions.
+
+In a FCFS queue the waiting time of every job follows from the arrival and service times alone, so no event set is
+needed. With one server, the waiting time of job k is given by Lindley's recursion
+
+    W[k] = max(0, W[k - 1] + S[k - 1] - A[k])        (A[k]: time between the arrivals of jobs k - 1 and k)
+
+whose solution is a running minimum of partial sums, P[k] - min(-W[-1], min(P[:k + 1])) with P = cumsum(S[k - 1] -
+A[k]), evaluated here with NumPy on whole blocks of jobs. With c servers the state is the vector of times at which the
+servers become free (the Kiefer-Wolfowitz workload vector, kept as a heap): each job starts at the later of its arrival
+and the earliest free time. That recursion is inherently sequential, so it runs as a tight Python loop over blocks of
+NumPy-generated times, which is still several times faster than the event-driven models.
+
+The rates follow mmn_queue / mmn_queue2: jobs arrive at rate lambd / n and are served at rate mu / n. Arrival and
+service times are generated in blocks of `block_size`. Percentiles come from a logarithmic histogram (relative
+accuracy about 0.1%), so memory does not grow with the number of jobs.
+
+    python mmn_queue2.py --engine lindley --n 4 --max-t 1e6
+    python lindley.py --check   # cross-check against mmn_queue2.MMN on the same jobs
+"""
+
+import argparse
+import heapq
+import math
+import os
+import tempfile
+
+import numpy as np
+
+BLOCK_SIZE = 1 << 18
+
+
+class LogHistogram:
+    """Counts of positive values in logarithmic bins from `low` to `high`, for percentiles of unbounded streams."""
+
+    def __init__(self, low=1e-6, high=1e6, bins=24_000):
+        self.log_low = math.log(low)
+        self.scale = bins / (math.log(high) - self.log_low)
+        self.counts = np.zeros(bins + 2, dtype=np.int64)  # plus underflow and overflow bins
+        self.bins = bins
+
+    def add(self, values):
+        index = np.floor((np.log(values) - self.log_low) * self.scale).astype(np.int64) + 1
+        np.clip(index, 0, self.bins + 1, out=index)
+        self.counts += np.bincount(index, minlength=self.bins + 2)
+
+    def percentile(self, p):
+        total = self.counts.sum()
+        if not total:
+            return math.nan
+        index = int(np.searchsorted(np.cumsum(self.counts), p / 100 * total))
+        return math.exp(self.log_low + (index - 0.5) / self.scale)  # the middle of the bin, geometrically
+
+
+class FCFSQueue:
+    """The state of a FCFS queue with n servers between blocks of jobs."""
+
+    def __init__(self, n):
+        self.n = n
+        self.last_arrival = 0.0
+        self.last_wait = 0.0  # one server: waiting time and service time of the last job
+        self.last_service = 0.0
+        self.free = [0.0] * n  # n servers: heap of the times at which the servers become free
+
+    def waiting_times(self, arrivals, services):
+        """Waiting times of jobs arriving at the (absolute, increasing) times `arrivals` with the given services."""
+        if self.n == 1:
+            x = np.empty(len(arrivals))
+            x[0] = self.last_service - (arrivals[0] - self.last_arrival)
+            x[1:] = services[:-1] - np.diff(arrivals)
+            partial = np.cumsum(x)
+            waits = partial - np.minimum(np.minimum.accumulate(partial), -self.last_wait)
+            self.last_wait, self.last_service = float(waits[-1]), float(services[-1])
+        else:
+            free = self.free
+            waits = []
+            append, replace = waits.append, heapq.heapreplace
+            for t, s in zip(arrivals.tolist(), services.tolist()):
+                start = free[0] if free[0] > t else t
+                replace(free, start + s)
+                append(start - t)
+            waits = np.array(waits)
+        self.last_arrival = float(arrivals[-1])
+        return waits
+
+
+def simulate_fcfs(lambd, mu, n, max_t, interarrival=None, service=None, seed=None, block_size=BLOCK_SIZE):
+    """Summary of a FCFS run up to time max_t, with the keys of stats.QueueStats.summary().
+
+    interarrival and service are variates samplers (with a sample(size) method); by default both are exponential,
+    drawn from a generator seeded with seed. Only jobs completed by max_t count, as in the event-driven models.
+    """
+    rng = np.random.default_rng(seed)
+    interarrival_block = interarrival.sample if interarrival is not None else \
+        (lambda size: rng.standard_exponential(size) / (lambd / n))
+    service_block = service.sample if service is not None else \
+        (lambda size: rng.standard_exponential(size) / (mu / n))
+    queue = FCFSQueue(n)
+    histogram = LogHistogram()
+    count, mean, m2 = 0, 0.0, 0.0
+    busy = 0.0
+    t = 0.0
+    while t <= max_t:
+        arrivals = t + np.cumsum(interarrival_block(block_size))
+        t = float(arrivals[-1])
+        services = service_block(block_size)
+        waits = queue.waiting_times(arrivals, services)
+        sojourns = waits + services
+        starts = arrivals + waits
+        done = arrivals + sojourns <= max_t
+        busy += float(np.clip(max_t - starts[starts < max_t], None, services[starts < max_t]).sum())
+        sojourns = sojourns[done]
+        if len(sojourns):
+            # merge the block's mean and sum of squared deviations into the running ones (Chan et al.)
+            block_mean = float(sojourns.mean())
+            block_m2 = float(((sojourns - block_mean) ** 2).sum())
+            total = count + len(sojourns)
+            delta = block_mean - mean
+            mean += delta * len(sojourns) / total
+            m2 += block_m2 + delta * delta * count * len(sojourns) / total
+            count = total
+            histogram.add(sojourns)
+    return {
+        'completed': count,
+        'W': mean if count else math.nan,
+        'W_stdev': math.sqrt(m2 / (count - 1)) if count > 1 else 0.0,
+        'W_p50': histogram.percentile(50),
+        'W_p90': histogram.percentile(90),
+        'W_p99': histogram.percentile(99),
+        'L': mean * count / max_t,  # Little's law over the completed jobs
+        'utilisation': busy / (n * max_t),
+    }
+
+
+def add_engine_arguments(parser):
+    """Add the --engine option of the FCFS MMN scripts."""
+    parser.add_argument('--engine', choices=['event', 'lindley'], default='event',
+                        help="event-driven simulation, or the Lindley / Kiefer-Wolfowitz recursion (see lindley.py)")
+
+
+# options of the MMN scripts that need the event-driven engine
+EVENT_ONLY_OPTIONS = ['restore', 'checkpoint', 'precision', 'trace', 'profile', 'profile_trace', 'job_trace',
+                      'workload']
+
+
+def check_engine_arguments(parser, args, max_n=None):
+    """Exit with a usage error if the options need the event-driven engine but --engine lindley was chosen, or if
+    --n is above the max_n servers the script's models support (with either engine)."""
+    if max_n is not None and args.n > max_n:
+        parser.error(f"--n {args.n}: this script simulates at most {max_n} server(s)")
+    if args.engine == 'lindley':
+        for name in EVENT_ONLY_OPTIONS:
+            if getattr(args, name, None):
+                parser.error(f"--{name.replace('_', '-')} needs --engine event")
+
+
+def cross_check(n, jobs, lambd=0.9, mu=1, seed=1):
+    """Largest difference between the sojourn times of the same jobs in mmn_queue2.MMN and in this engine."""
+    import mmn_queue2
+    from job_trace import JobTraceWriter
+    from trace_analysis import load_trace
+    from workload import TraceWorkload
+
+    rng = np.random.default_rng(seed)
+    interarrivals = rng.standard_exponential(jobs) / (lambd / n)
+    services = rng.standard_exponential(jobs) / (mu / n)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'jobs.npy')
+        np.save(path, np.column_stack([interarrivals, services]))
+        sim = mmn_queue2.MMN(lambd, mu, n, workload=TraceWorkload(path))
+        sim.job_trace = JobTraceWriter(os.path.join(directory, 'trace'))
+        sim.run()
+        sim.job_trace.close()
+        trace = load_trace(os.path.join(directory, 'trace'))
+        event_sojourns = np.empty(jobs)
+        event_sojourns[trace['job']] = trace['completion'] - trace['arrival']
+    arrivals = np.cumsum(interarrivals)
+    sojourns = FCFSQueue(n).waiting_times(arrivals, services) + services
+    return float(np.abs(sojourns - event_sojourns).max() / sojourns.max())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--check', action='store_true',
+                        help="compare the per-job sojourn times with mmn_queue2 on the same jobs, for 1 and 4 servers")
+    parser.add_argument('--jobs', type=int, default=100_000, help="jobs of the cross-check")
+    args = parser.parse_args()
+    if not args.check:
+        parser.error("run the engine through mmn_queue.py or mmn_queue2.py with --engine lindley, or use --check")
+
+    failed = False
+    for n in (1, 4):
+        error = cross_check(n, args.jobs)
+        failed |= error > 1e-9
+        print(f"{n} server(s), {args.jobs} jobs: largest relative difference {error:.2e}")
+    if failed:
+        raise SystemExit("the engines disagree")
+
+
+if __name__ == '__main__':
+    main()
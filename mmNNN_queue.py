@@ -1,94 +1,161 @@
 #!/usr/bin/env python
 import argparse
-import csv
-import collections
+from array import array
 from random import expovariate
 
-from discrete_event_sim_V01 import Simulation, Event
+from discrete_event_sim_V01 import Simulation, BaseEvent
+from dispatch import DISPATCHERS
+from mmn_cli import add_mmn_arguments, run_main
+from stats import QueueStats
+from workload import GeneratedWorkload, add_workload_arguments, workload_from_args
 
 
 class MMN(Simulation):
-
-    def __init__(self, lambd, mu, n):
-        super().__init__()
-        self.servers = [{'running': None, 'queue': collections.deque()} for _ in range(n)]
-        self.arrivals = {}
-        self.completions = {}
+    """n servers, each with its own FIFO queue; a dispatcher (see the dispatch module) chooses the server of every
+    arriving job.
+
+    Server state is kept in flat arrays rather than one object per server, so that systems with 10^4-10^5 servers
+    stay small: running[i] is the job served by server i (-1 if idle), lengths[i] the number of jobs at server i, and
+    the waiting jobs of server i form a linked list from head[i] to tail[i] through the `successor` dictionary, which
+    only holds jobs that are waiting.
+
+    Interarrival and service samplers (see the variates module) are used through a workload.GeneratedWorkload, so
+    that parallel_sim draws the same jobs from the same samplers.
+    """
+
+    def __init__(self, lambd, mu, n, event_queue='heap', policy='round-robin', d=2, interarrival=None, service=None,
+                 workload=None):
+        super().__init__(event_queue)
+        self.running = array('q', [-1]) * n
+        self.lengths = array('l', [0]) * n
+        self.head = array('q', [-1]) * n
+        self.tail = array('q', [-1]) * n
+        self.successor = {}  # job id -> next job waiting at the same server
+        self.dispatcher = DISPATCHERS[policy](n, d)
+        self.arrivals = {}  # arrival time of each job in the system
+        self.service_start = array('d', [0.0]) * n  # the time at which each server started serving its current job
+        self.stats = QueueStats(n)  # online statistics, updated at every arrival and completion
+        self.job_trace = None  # if not None, a job_trace.JobTraceWriter recording every completed job
         self.lambd = lambd
         self.mu = mu
         self.n = n
         self.arrival_time = lambd / n
         self.completion_time = mu / n
-        self.schedule(expovariate(lambd), Arrival(0, 0))
+        self.interarrival = interarrival  # callable returning interarrival times, None for expovariate
+        self.service = service  # callable returning service times, None for expovariate
+        if workload is None and interarrival is not None and service is not None:
+            workload = GeneratedWorkload(interarrival, service)
+        self.workload = workload  # if not None, a workload replacing interarrival and service
+        if workload is None:
+            self.schedule(expovariate(lambd), self.new_event(Arrival, 0))
+        else:
+            self.schedule_arrival(0)
 
     def schedule_arrival(self, job_id):
-        arrival_time = expovariate(self.arrival_time)
-        server_index = job_id % self.n
-        self.schedule(arrival_time, Arrival(job_id, server_index))
+        if self.workload is not None:
+            delay = self.workload.interarrival()
+            if delay is None:
+                return  # the trace is over: no more arrivals
+        else:
+            delay = expovariate(self.arrival_time) if self.interarrival is None else self.interarrival()
+        self.schedule(delay, self.new_event(Arrival, job_id))
 
     def schedule_completion(self, job_id, server_index):
-        self.schedule(expovariate(self.completion_time), Completion(job_id, server_index))
+        if self.workload is not None:
+            delay = self.workload.service(job_id)
+        else:
+            delay = expovariate(self.completion_time) if self.service is None else self.service()
+        self.schedule(delay, self.new_event(Completion, job_id, server_index))
+
+    def enqueue(self, job_id, server_index):
+        """Append a job to the waiting line of a server."""
+        if self.tail[server_index] == -1:
+            self.head[server_index] = job_id
+        else:
+            self.successor[self.tail[server_index]] = job_id
+        self.tail[server_index] = job_id
+
+    def dequeue(self, server_index):
+        """Remove and return the first job waiting at a server, or -1 if there is none."""
+        job_id = self.head[server_index]
+        if job_id != -1:
+            next_job = self.successor.pop(job_id, -1)
+            self.head[server_index] = next_job
+            if next_job == -1:
+                self.tail[server_index] = -1
+        return job_id
 
     @property
     def queue_len(self):
-        return sum([(server['running'] is not None) + len(server['queue']) for server in self.servers])
+        return self.stats.in_system
 
 
-class Arrival(Event):
+class Arrival(BaseEvent):
+    __slots__ = ('id',)
+    recyclable = True
 
-    def __init__(self, job_id, server_index):
+    def __init__(self, job_id):
         self.id = job_id
-        self.server_index = server_index
 
     def process(self, sim: MMN):
+        server_index = sim.dispatcher.choose(sim.lengths)
         sim.arrivals[self.id] = sim.t
-        if sim.servers[self.server_index]['running'] is None:
-            sim.servers[self.server_index]['running'] = self.id
-            sim.schedule_completion(self.id, self.server_index)
+        sim.stats.job_arrived(sim.t)
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'arrival', self.id, server_index)
+        if sim.running[server_index] == -1:
+            sim.running[server_index] = self.id
+            sim.service_start[server_index] = sim.t
+            sim.stats.server_busy(server_index, sim.t)
+            sim.schedule_completion(self.id, server_index)
         else:
-            sim.servers[self.server_index]['queue'].append(self.id)
+            sim.enqueue(self.id, server_index)
+        sim.lengths[server_index] += 1
+        sim.dispatcher.update(server_index, sim.lengths[server_index])
         sim.schedule_arrival(self.id + 1)
 
 
-class Completion(Event):
+class Completion(BaseEvent):
+    __slots__ = ('id', 'server_index')
+    recyclable = True
 
     def __init__(self, job_id, server_index):
         self.id = job_id
         self.server_index = server_index
 
     def process(self, sim: MMN):
-        assert sim.servers[self.server_index]['running'] is not None
-        sim.completions[sim.servers[self.server_index]['running']] = sim.t
-        if sim.servers[self.server_index]['queue']:
-            next_job = sim.servers[self.server_index]['queue'].popleft()
-            sim.servers[self.server_index]['running'] = next_job
-            sim.schedule_completion(next_job, self.server_index)
+        server_index = self.server_index
+        job_id = sim.running[server_index]
+        assert job_id != -1
+        arrival = sim.arrivals.pop(job_id)
+        sim.stats.job_completed(sim.t, arrival)
+        if sim.job_trace is not None:
+            sim.job_trace.record(job_id, arrival, sim.service_start[server_index], sim.t, server_index)
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'completion', job_id, server_index)
+        next_job = sim.dequeue(server_index)
+        sim.running[server_index] = next_job
+        if next_job != -1:
+            sim.service_start[server_index] = sim.t
+            sim.schedule_completion(next_job, server_index)
         else:
-            sim.servers[self.server_index]['running'] = None
+            sim.stats.server_idle(server_index, sim.t)
+        sim.lengths[server_index] -= 1
+        sim.dispatcher.update(server_index, sim.lengths[server_index])
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--lambd', type=float, default=0.7)
-    parser.add_argument('--mu', type=float, default=1)
-    parser.add_argument('--max-t', type=float, default=1_000_000)
-    parser.add_argument('--n', type=int, default=2)
-    parser.add_argument('--csv', help="CSV file in which to store results")
+    add_mmn_arguments(parser, n=2)
+    parser.add_argument('--policy', choices=DISPATCHERS, default='round-robin', help="load-balancing policy")
+    parser.add_argument('--d', type=int, default=2, help="servers sampled by the power-of-d policy")
+    add_workload_arguments(parser)
     args = parser.parse_args()
-
-    sim = MMN(args.lambd, args.mu, args.n)
-    sim.run(args.max_t)
-
-    completions = sim.completions
-    W = (sum(completions.values()) - sum(sim.arrivals[job_id] for job_id in completions)) / len(completions)
-    print(f"Average time spent in the system: {W}")
-    print(f"Theoretical expectation for random server choice: {1 / (1 - args.lambd)}")
-
-    if args.csv is not None:
-        with open(args.csv, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([args.lambd, args.mu, args.max_t, W])
+    run_main(args, 'mmNNN_queue', lambda args, interarrival, service: MMN(
+        args.lambd, args.mu, args.n, args.event_queue, args.policy, args.d, interarrival, service,
+        workload_from_args(args)))
 
 
 if __name__ == '__main__':
-    main()
+    import mmNNN_queue  # run as the mmNNN_queue module, so that snapshots refer to mmNNN_queue.* and not to __main__.*
+    mmNNN_queue.main()
@@ -0,0 +1,119 @@
+"""The command line shared by the MMN scripts (mmn_queue, mmn_queue2, mmNNN_queue).
+
+Each script adds its own options to the common ones, then hands the parsed arguments to run_main() with a function
+building its simulation:
+
+    parser = argparse.ArgumentParser()
+    add_mmn_arguments(parser, n=2)
+    parser.add_argument('--policy', ...)
+    args = parser.parse_args()
+    run_main(args, 'mmNNN_queue', lambda args, interarrival, service: MMN(args.lambd, ...))
+
+run_main() answers from the analytical formulas (--analytical) or from the result cache (--cache) when it can,
+otherwise runs the Lindley engine (--engine lindley) or the event-driven simulation, with checkpoints, tracing,
+profiling and steady-state run control as requested, and prints the results.
+"""
+
+import csv
+import sys
+
+from analytical import describe, expected
+from checkpoint import Checkpoint, add_checkpoint_arguments, load_snapshot
+from discrete_event_sim_V01 import EVENT_QUEUES
+from job_trace import JobTraceWriter, add_job_trace_arguments
+from lindley import simulate_fcfs
+from profiler import add_profile_arguments, profiler_from_args, report_profile
+from result_cache import add_cache_arguments, cache_from_args, run_parameters
+from steady_state import SteadyState
+from tracing import add_trace_arguments, tracer_from_args
+from variates import add_variate_arguments, variates_from_args
+
+
+def add_mmn_arguments(parser, n):
+    """Add the options shared by the MMN scripts; n is the default number of servers."""
+    parser.add_argument('--lambd', type=float, default=0.7)
+    parser.add_argument('--mu', type=float, default=1)
+    parser.add_argument('--max-t', type=float, default=1_000_000)
+    parser.add_argument('--n', type=int, default=n)
+    parser.add_argument('--csv', help="CSV file in which to store results")
+    parser.add_argument('--event-queue', choices=EVENT_QUEUES, default='heap', help="event-set backend")
+    add_trace_arguments(parser)
+    add_variate_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_profile_arguments(parser)
+    add_job_trace_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument('--precision', type=float,
+                        help="stop as soon as the relative half-width of the 95%% confidence interval of W, "
+                             "estimated by batch means after MSER-5 warm-up truncation, is below this value")
+
+
+def simulate(args, build):
+    """Run the event-driven simulation requested on the command line; return (simulation, steady-state control or
+    None). build(args, interarrival, service) makes a new simulation, unless one is restored from a snapshot."""
+    if args.restore is not None:
+        sim = load_snapshot(args.restore, args.seed)
+    else:
+        interarrival, service = variates_from_args(args, args.lambd / args.n, args.mu / args.n)
+        sim = build(args, interarrival, service)
+        if args.job_trace is not None:
+            sim.job_trace = JobTraceWriter(args.job_trace)
+        if args.checkpoint is not None:
+            sim.schedule_daemon(args.checkpoint_every, Checkpoint(args.checkpoint_every, args.checkpoint))
+    sim.tracer = tracer_from_args(args)
+    sim.profiler = profiler_from_args(args)
+    control = None
+    if args.precision is not None:
+        control = SteadyState(args.precision)
+        sim.stats.on_sojourn = control.add
+    sim.run(args.max_t, stop=control, check_every=10_000)
+    if sim.tracer is not None:
+        sim.tracer.close()
+    if sim.job_trace is not None:
+        sim.job_trace.close()
+    report_profile(sim.profiler, args)
+    return sim, control
+
+
+def run_main(args, model, build):
+    """Everything the MMN scripts do after parsing their arguments (see the module documentation)."""
+    params = run_parameters(args, model)
+    theory = expected(model, params)
+    if args.analytical and theory is not None and theory['exact']:
+        print(describe(theory))
+        return
+    cache = cache_from_args(args)
+    summary = cache.get(model, params, args.seed) if cache is not None else None
+
+    W = None
+    if summary is not None:
+        print(f"Result of a previous run, from {args.cache}")
+    else:
+        if getattr(args, 'engine', 'event') == 'lindley':
+            interarrival, service = variates_from_args(args, args.lambd / args.n, args.mu / args.n)
+            summary = simulate_fcfs(args.lambd, args.mu, args.n, args.max_t, interarrival, service, args.seed)
+        else:
+            sim, control = simulate(args, build)
+            summary = sim.stats.summary(sim.t)
+            if control is not None:
+                if control.converged():
+                    W = control.mean
+                    print(f"Stopped at time {sim.t:.0f} after {control.count} jobs, {control.truncated} discarded as "
+                          f"warm-up; W = {W:.4f} ± {control.half_width:.4f}")
+                else:
+                    print(f"Warning: precision {args.precision} not reached by time {sim.t:.0f} "
+                          f"({control.count} jobs); W is the mean over the whole run", file=sys.stderr)
+        if cache is not None:
+            cache.put(model, params, args.seed, summary)
+    if W is None:
+        W = summary['W']
+    print(f"Average time spent in the system: {W}")
+    print(f"Sojourn time percentiles: 50% {summary['W_p50']:.3f}, 90% {summary['W_p90']:.3f}, "
+          f"99% {summary['W_p99']:.3f}")
+    print(f"Average number of jobs in the system: {summary['L']:.3f}, server utilisation: {summary['utilisation']:.3f}")
+    print(describe(theory))
+
+    if args.csv is not None:
+        with open(args.csv, 'a', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([args.lambd, args.mu, args.max_t, W])
@@ -1,17 +1,19 @@
 #!/usr/bin/env python
 
 import argparse
-import csv
 import collections
 from random import expovariate
 
-from discrete_event_sim import Simulation, Event
+from discrete_event_sim_V01 import Simulation, BaseEvent
+from lindley import add_engine_arguments, check_engine_arguments
+from mmn_cli import add_mmn_arguments, run_main
+from stats import QueueStats
 
 # To use weibull variates, for a given set of parameter do something like
-# from weibull import weibull_generator
+# from variates import weibull_generator
 # gen = weibull_generator(shape, mean)
 #
-# and then call gen() every time you need a random variable
+# and then call gen() every time you need a random variable (or pass it as MMN(..., service=gen))
 # L = λ * W
 # L: Length of the queue
 # λ: Arrival rate
@@ -21,37 +23,45 @@ from discrete_event_sim import Simulation, Event
 
 class MMN(Simulation):
 
-    def __init__(self, lambd, mu, n):  # lambd is the overall arrival rate for the system,service rate,number of servers in the system
+    def __init__(self, lambd, mu, n, event_queue='heap', interarrival=None, service=None):  # lambd is the overall arrival rate for the system,service rate,number of servers in the system
         if n != 1:
             raise NotImplementedError  # extend this to make it work for multiple queues
 
-        super().__init__()
+        super().__init__(event_queue)
         self.running = None  # if not None, the id of the running job
         self.queue = collections.deque()  # FIFO queue of the system
-        self.arrivals = {}  # dictionary mapping job id to arrival time
-        self.completions = {}  # dictionary mapping job id to completion time
+        self.arrivals = {}  # dictionary mapping the id of each job in the system to its arrival time
+        self.service_start = 0.0  # the time at which the running job started its service
+        self.stats = QueueStats(n)  # online statistics, updated at every arrival and completion
+        self.job_trace = None  # if not None, a job_trace.JobTraceWriter recording every completed job
         self.lambd = lambd  # the arrival rate
         self.n = n  # number of servers in the system
         self.mu = mu  # service rate of the servers
         self.arrival_rate = lambd / n
         self.completion_rate = mu / n
-        self.schedule(expovariate(lambd), Arrival(0))
+        self.interarrival = interarrival  # callable returning interarrival times, None for expovariate
+        self.service = service  # callable returning service times, None for expovariate
+        self.schedule(expovariate(lambd), self.new_event(Arrival, 0))
 
     def schedule_arrival(self, job_id):
         # schedule the arrival following an exponential distribution, to compensate the number of queues the arrival
         # time should depend also on "n"
-        self.schedule(expovariate(self.arrival_rate), Arrival(job_id))
+        delay = expovariate(self.arrival_rate) if self.interarrival is None else self.interarrival()
+        self.schedule(delay, self.new_event(Arrival, job_id))
 
     def schedule_completion(self, job_id):
         # schedule the time of the completion event
-        self.schedule(expovariate(self.completion_rate), Completion(job_id))
+        delay = expovariate(self.completion_rate) if self.service is None else self.service()
+        self.schedule(delay, self.new_event(Completion, job_id))
 
     @property
     def queue_len(self):
         return (self.running is not None) + len(self.queue)
 
 
-class Arrival(Event):
+class Arrival(BaseEvent):
+    __slots__ = ('id',)
+    recyclable = True
 
     def __init__(self, job_id):
         self.id = job_id
@@ -59,9 +69,14 @@ class Arrival(Event):
     def process(self, sim: MMN):
         # set the arrival time of the job
         sim.arrivals[self.id] = sim.t
+        sim.stats.job_arrived(sim.t)
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'arrival', self.id, 0)
         # if there is no running job, assign the incoming one and schedule its completion
         if sim.running is None:
             sim.running = self.id
+            sim.service_start = sim.t
+            sim.stats.server_busy(0, sim.t)
             sim.schedule_completion(self.id)
         # otherwise put the job into the queue
         else:
@@ -71,44 +86,42 @@ class Arrival(Event):
 
 
 # manage the completion of the running job and schedule the next job from the queue, if any.
-class Completion(Event):
+class Completion(BaseEvent):
+    __slots__ = ('id',)
+    recyclable = True
+
     def __init__(self, job_id):
         self.id = job_id  # currently unused, might be useful when extending
 
     def process(self, sim: MMN):
         assert sim.running is not None
-        sim.completions[sim.running] = sim.t  # set the completion time of the running job
+        arrival = sim.arrivals.pop(sim.running)
+        sim.stats.job_completed(sim.t, arrival)  # the job leaves the system
+        if sim.job_trace is not None:
+            sim.job_trace.record(sim.running, arrival, sim.service_start, sim.t, 0)
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'completion', sim.running, 0)
         # if the queue is not empty
         if sim.queue:
             next_job = sim.queue.popleft()  # get a job from the queue
             sim.running = next_job
+            sim.service_start = sim.t
             sim.schedule_completion(next_job)  # schedule its completion
         else:
             sim.running = None
+            sim.stats.server_idle(0, sim.t)
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--lambd', type=float, default=0.7)
-    parser.add_argument('--mu', type=float, default=1)
-    parser.add_argument('--max-t', type=float, default=1_000_000)
-    parser.add_argument('--n', type=int, default=1)
-    parser.add_argument('--csv', help="CSV file in which to store results")
+    add_mmn_arguments(parser, n=1)
+    add_engine_arguments(parser)
     args = parser.parse_args()
-
-    sim = MMN(args.lambd, args.mu, args.n)
-    sim.run(args.max_t)
-
-    completions = sim.completions
-    W = (sum(completions.values()) - sum(sim.arrivals[job_id] for job_id in completions)) / len(completions)
-    print(f"Average time spent in the system: {W}")
-    print(f"Theoretical expectation for random server choice: {1 / (1 - args.lambd)}")
-
-    if args.csv is not None:
-        with open(args.csv, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([args.lambd, args.mu, args.max_t, W])
+    check_engine_arguments(parser, args, max_n=1)
+    run_main(args, 'mmn_queue', lambda args, interarrival, service: MMN(
+        args.lambd, args.mu, args.n, args.event_queue, interarrival=interarrival, service=service))
 
 
 if __name__ == '__main__':
-    main()
+    import mmn_queue  # run as the mmn_queue module, so that snapshots refer to mmn_queue.* and not to __main__.*
+    mmn_queue.main()
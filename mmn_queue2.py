@@ -1,101 +1,134 @@
 #!/usr/bin/env python
 import argparse
-import csv
 import collections
 from random import expovariate
 
-from discrete_event_sim_V01 import Simulation, Event
+from discrete_event_sim_V01 import Simulation, BaseEvent
+from lindley import add_engine_arguments, check_engine_arguments
+from mmn_cli import add_mmn_arguments, run_main
+from stats import QueueStats
+from workload import add_workload_arguments, workload_from_args
 
 
 class MMN(Simulation):
 
-    def __init__(self, lambd, mu, n):
-        super().__init__()
+    def __init__(self, lambd, mu, n, event_queue='heap', interarrival=None, service=None, workload=None):
+        super().__init__(event_queue)
         self.running = [None] * n           # list of length n  to store the ids of running jobs for each server and initialized as "None"
         self.queue = collections.deque()     # FIFO this is a deque object stores the ids of jobs that are waiting in the queue to be served.
-        self.arrivals = {}  # dictionary maps job ids to their arrivals time
-        self.completions = {}  # dictionary maps job ids to their completion time
+        self.free = list(range(n - 1, -1, -1))  # stack of the idle servers, the lowest index on top
+        self.busy = 0  # number of busy servers, so that queue_len doesn't have to scan self.running
+        self.arrivals = {}  # dictionary maps the ids of the jobs in the system to their arrival time
+        self.service_start = [0.0] * n  # the time at which each server started serving its current job
+        self.stats = QueueStats(n)  # online statistics, updated at every arrival and completion
+        self.job_trace = None  # if not None, a job_trace.JobTraceWriter recording every completed job
         self.lambd = lambd  # the arrival rate
         self.mu = mu  # service rate of the servers
         self.n = n  # number of servers in the system
         self.arrival_rate = lambd / n  # arrival rate per server
         self.completion_rate = mu / n  # completion rate per server
-        self.schedule(expovariate(lambd), Arrival(0))
+        self.interarrival = interarrival  # callable returning interarrival times, None for expovariate
+        self.service = service  # callable returning service times, None for expovariate
+        self.workload = workload  # if not None, a workload.TraceWorkload replacing interarrival and service
+        if workload is None:
+            self.schedule(expovariate(lambd), self.new_event(Arrival, 0))
+        else:
+            self.schedule_arrival(0)
         # this schedules the first job arrival event with an arrival time of expovariate(lambd) and job id of (0) by calling
         # the schedule method of the Simulation class.
 
     def schedule_arrival(self, job_id):
-        self.schedule(expovariate(self.arrival_rate), Arrival(job_id))
+        if self.workload is not None:
+            delay = self.workload.interarrival()
+            if delay is None:
+                return  # the trace is over: no more arrivals
+        else:
+            delay = expovariate(self.arrival_rate) if self.interarrival is None else self.interarrival()
+        self.schedule(delay, self.new_event(Arrival, job_id))
         # This schedules a new job arrival event with an arrival time of expovariate(self.arrival_rate) and the specified job id.
 
     def schedule_completion(self, job_id, server):
-        self.schedule(expovariate(self.completion_rate), Completion(job_id, server))
+        if self.workload is not None:
+            delay = self.workload.service(job_id)
+        else:
+            delay = expovariate(self.completion_rate) if self.service is None else self.service()
+        self.schedule(delay, self.new_event(Completion, job_id, server))
         # This schedules a job completion event for the specified job id and server with a completion time of expovariate(self.completion_rate).
 
     @property
     def queue_len(self):
-        _Total_running = [element for element in self.running if element is not None]
-        return len(_Total_running) + len(self.queue)
+        return self.busy + len(self.queue)
 
         # This is used to create a read-only attribute queue_len which returns the total number of jobs in the system, including running jobs and jobs in the queue.
 
 
 # class of the arrival
 
-class Arrival(Event):
+class Arrival(BaseEvent):
+    __slots__ = ('id',)
+    recyclable = True
 
     def __init__(self, job_id):
         self.id = job_id
 
     def process(self, sim: MMN):
         sim.arrivals[self.id] = sim.t
-        if not any(sim.running):  # if all servers are free, assign the incoming job to a random server and schedule its completion
-            server = sim.running.index(None)
+        sim.stats.job_arrived(sim.t)
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'arrival', self.id, -1)
+        if sim.free:  # if a server is idle, assign the incoming job to it and schedule its completion
+            server = sim.free.pop()
             sim.running[server] = self.id
+            sim.service_start[server] = sim.t
+            sim.busy += 1
+            sim.stats.server_busy(server, sim.t)
             sim.schedule_completion(self.id, server)
         else:
             sim.queue.append(self.id)
         sim.schedule_arrival(self.id + 1)
 
 
-class Completion(Event):
+class Completion(BaseEvent):
+    __slots__ = ('id', 'server')
+    recyclable = True
 
     def __init__(self, job_id, server):
         self.id = job_id
         self.server = server
 
     def process(self, sim: MMN):
-        assert sim.running[self.server] is not None
-        sim.completions[sim.running[self.server]] = sim.t
-        sim.running[self.server] = None  # release the server
+        job_id = sim.running[self.server]
+        assert job_id is not None
+        arrival = sim.arrivals.pop(job_id)
+        sim.stats.job_completed(sim.t, arrival)
+        if sim.job_trace is not None:
+            sim.job_trace.record(job_id, arrival, sim.service_start[self.server], sim.t, self.server)
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'completion', job_id, self.server)
         if sim.queue:  # if the queue is not empty, assign the next job to the same server
             next_job = sim.queue.popleft()
             sim.running[self.server] = next_job
+            sim.service_start[self.server] = sim.t
             sim.schedule_completion(next_job, self.server)
+        else:  # release the server
+            sim.running[self.server] = None
+            sim.free.append(self.server)
+            sim.busy -= 1
+            sim.stats.server_idle(self.server, sim.t)
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--lambd', type=float, default=0.7)
-    parser.add_argument('--mu', type=float, default=1)
-    parser.add_argument('--max-t', type=float, default=1_000_000)
-    parser.add_argument('--n', type=int, default=2)
-    parser.add_argument('--csv', help="CSV file in which to store results")
+    add_mmn_arguments(parser, n=2)
+    add_engine_arguments(parser)
+    add_workload_arguments(parser)
     args = parser.parse_args()
-
-    sim = MMN(args.lambd, args.mu, args.n)
-    sim.run(args.max_t)
-
-    completions = sim.completions
-    W = (sum(completions.values()) - sum(sim.arrivals[job_id] for job_id in completions)) / len(completions)
-    print(f"Average time spent in the system: {W}")
-    print(f"Theoretical expectation for random server choice: {1 / (1 - args.lambd)}")
-
-    if args.csv is not None:
-        with open(args.csv, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([args.lambd, args.mu, args.max_t, W])
+    check_engine_arguments(parser, args)
+    run_main(args, 'mmn_queue2', lambda args, interarrival, service: MMN(
+        args.lambd, args.mu, args.n, args.event_queue, interarrival=interarrival, service=service,
+        workload=workload_from_args(args)))
 
 
 if __name__ == '__main__':
-    main()
+    import mmn_queue2  # run as the mmn_queue2 module, so that snapshots refer to mmn_queue2.* and not to __main__.*
+    mmn_queue2.main()
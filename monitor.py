@@ -0,0 +1,215 @@
+"""Periodic monitoring of simulation state into compact time series.
+
+A TimeSeries stores (time, value, value, ...) rows in a preallocated array of doubles, with the real simulated time of
+every sample, in one of three modes:
+
+- unbounded (the default): the buffer doubles when full;
+- bounded (max_points=N): when N rows are stored they are downsampled to N / 2, keeping the shape of the `key`
+  column with LTTB (largest triangle three buckets, Steinarsson 2013) or the minimum and maximum of every bucket.
+  From then on each stored row stands for twice as many samples: of every group of new samples, the one whose key
+  value is farthest from the last stored row is kept, so the whole run ends up with the same resolution and peaks
+  are not lost;
+- streaming (path=...): when the buffer is full its rows are appended to a binary file of float64 rows, with the
+  column names in a <path>.columns.json side file; read_series() reads it back. Call flush() at the end of the run
+  to write the last rows (a Monitor does it when it stops).
+
+A Monitor event samples a probe -- a function returning the current values, which should take constant time, e.g. by
+reading counters the model keeps up to date -- into a series at a fixed interval:
+
+    series = TimeSeries(('in_system',))
+    sim.schedule(0, Monitor(series, sim.jobs_in_system, interval=10))
+    sim.run(max_t)
+    series.times, series.column('in_system')
+"""
+
+import json
+from array import array
+
+from discrete_event_sim_V01 import BaseEvent
+
+
+def lttb(t, y, threshold):
+    """Indices of `threshold` points of (t, y) chosen by the largest-triangle-three-buckets algorithm.
+
+    The first and last points are always kept; every bucket in between contributes the point forming the largest
+    triangle with the point chosen in the previous bucket and the average of the next bucket.
+    """
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    chosen = [0]
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        if end >= next_end:  # last bucket: the next one is the final point
+            next_end = n
+        count = next_end - end
+        avg_t = sum(t[end:next_end]) / count
+        avg_y = sum(y[end:next_end]) / count
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((t[a] - avg_t) * (y[j] - y[a]) - (t[a] - t[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        chosen.append(best)
+        a = best
+    chosen.append(n - 1)
+    return chosen
+
+
+def minmax(t, y, threshold):
+    """Indices of at most `threshold` points of (t, y): the first and last, and the minimum and maximum of y in each
+    of (threshold - 2) / 2 buckets, in time order."""
+    n = len(t)
+    if threshold >= n or threshold < 4:
+        return list(range(n))
+    buckets = (threshold - 2) // 2
+    every = (n - 2) / buckets
+    chosen = [0]
+    for bucket in range(buckets):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        values = y[start:end]
+        if not values:
+            continue
+        low = start + min(range(len(values)), key=values.__getitem__)
+        high = start + max(range(len(values)), key=values.__getitem__)
+        chosen.extend(sorted({low, high}))
+    chosen.append(n - 1)
+    return chosen
+
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': minmax}
+
+
+class TimeSeries:
+    """Samples of the named columns over time; see the module documentation for the three modes."""
+
+    def __init__(self, columns, capacity=4096, max_points=None, downsample='lttb', key=0, path=None):
+        self.columns = tuple(columns)
+        self.width = len(self.columns) + 1  # doubles per row: the time and one value per column
+        if max_points is not None:
+            capacity = max_points
+        self.capacity = capacity  # rows the buffer can hold
+        self.data = array('d', bytes(8 * self.width * capacity))
+        self.rows = 0  # rows in the buffer
+        self.max_points = max_points
+        self.downsample = downsample
+        self.key = key  # index of the column whose shape downsampling preserves
+        self.path = path
+        self.written = 0  # rows appended to the file, in streaming mode
+        self.every = 1  # samples per stored row; doubles at every downsampling in bounded mode
+        self.group = 0  # samples seen in the current group, when every > 1
+        self.candidate = None  # (distance, t, values) of the row kept from the current group so far
+        if path is not None:
+            open(path, 'wb').close()
+            with open(path + '.columns.json', 'w') as f:
+                json.dump(self.columns, f)
+
+    def append(self, t, values):
+        if self.every > 1:
+            self._group(t, values)
+            return
+        self._store(t, values)
+
+    def _store(self, t, values):
+        if self.rows == self.capacity:
+            self._full()
+        data, i = self.data, self.rows * self.width
+        data[i] = t
+        for value in values:
+            i += 1
+            data[i] = value
+        self.rows += 1
+
+    def _group(self, t, values):
+        last = self.data[(self.rows - 1) * self.width + self.key + 1]
+        distance = abs(values[self.key] - last)
+        if self.candidate is None or distance > self.candidate[0]:
+            self.candidate = distance, t, tuple(values)
+        self.group += 1
+        if self.group == self.every:
+            self._close_group()
+
+    def _close_group(self):
+        if self.candidate is not None:
+            self._store(*self.candidate[1:])
+        self.group, self.candidate = 0, None
+
+    def _full(self):
+        if self.path is not None:
+            self.flush()
+        elif self.max_points is not None:
+            self._compact(self.max_points // 2)
+        else:
+            self.data.frombytes(bytes(8 * self.width * self.capacity))
+            self.capacity *= 2
+
+    def _compact(self, threshold):
+        """Keep `threshold` of the stored rows, chosen by the downsampling algorithm."""
+        width, data = self.width, self.data
+        used = data[:self.rows * width]
+        keep = DOWNSAMPLERS[self.downsample](used[0::width], used[self.key + 1::width], threshold)
+        for row, index in enumerate(keep):
+            data[row * width:(row + 1) * width] = used[index * width:(index + 1) * width]
+        self.rows = len(keep)
+        self.every *= 2
+
+    def flush(self):
+        """Store the row of the current group of samples, if any (bounded mode), and in streaming mode append the
+        buffered rows to the file and empty the buffer."""
+        self._close_group()
+        if self.path is None or not self.rows:
+            return
+        with open(self.path, 'ab') as f:  # opened each time, so that the series can be pickled in checkpoints
+            self.data[:self.rows * self.width].tofile(f)
+        self.written += self.rows
+        self.rows = 0
+
+    def __len__(self):
+        return self.written + self.rows
+
+    @property
+    def times(self):
+        """The sample times in the buffer (in streaming mode, only those not yet written: see read_series())."""
+        return self.data[0:self.rows * self.width:self.width]
+
+    def column(self, name):
+        """The values of a column in the buffer, as an array of doubles."""
+        offset = self.columns.index(name) + 1
+        return self.data[offset:self.rows * self.width:self.width]
+
+
+def read_series(path):
+    """Read a series streamed to path: a dictionary with the 't' array and one array per column."""
+    import numpy as np
+
+    with open(path + '.columns.json') as f:
+        columns = json.load(f)
+    rows = np.fromfile(path, dtype='<f8').reshape(-1, len(columns) + 1)
+    return {'t': rows[:, 0], **{name: rows[:, i + 1] for i, name in enumerate(columns)}}
+
+
+class Monitor(BaseEvent):
+    """Append the values returned by probe() to a series every `interval` time units.
+
+    The monitor stops rescheduling itself when done(sim) is true: by default, when no other event is pending, apart
+    from daemons such as checkpoints (see Simulation.schedule_daemon). Subclasses can redefine done().
+    """
+    __slots__ = ('series', 'probe', 'interval')
+
+    def __init__(self, series, probe, interval=1):
+        self.series = series
+        self.probe = probe
+        self.interval = interval
+
+    def process(self, sim):
+        self.series.append(sim.t, self.probe())
+        if not self.done(sim):
+            sim.schedule(self.interval, self)
+        else:
+            self.series.flush()
+
+    def done(self, sim):
+        return len(sim.event_queue) <= sim.daemons
@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+"""Conservative parallel simulation of the multi-queue model (mmNNN_queue) on several processes.
+
+The model is split into logical processes (LPs): a dispatcher, which generates the jobs and chooses their server, and
+`workers` groups of consecutive servers, each simulated by a ServerGroup (an ordinary Simulation) in its own process.
+The only interaction between partitions is the dispatcher sending arrivals to the groups, so each group receives its
+arrivals through a single-producer single-consumer ring buffer in shared memory, in blocks of messages sorted by time.
+Every block also carries the channel clock: the time of the last arrival generated so far, before which the dispatcher
+promises no further messages. A group can therefore safely process all its events up to that clock (the Chandy-Misra
+conservative rule) and wait for the next block; blocks without messages are null messages that only advance the clock.
+
+This only works for dispatch policies that do not look at the queues (random and round-robin): with jsq and
+power-of-d, every arrival depends on the state of all the servers at that instant, so there is no lookahead and those
+policies need the sequential mmNNN_queue.
+
+Every job carries its own service time, drawn when it is generated, so the result does not depend on the order in which
+servers across partitions start their jobs. The jobs are replayed from a trace (--workload) or drawn by a
+workload.GeneratedWorkload, as in the sequential mmNNN_queue; generated jobs always come from NumPy blocks, so the
+default --variates python counts as numpy here. With the same trace, or the same --seed and variate options as
+`mmNNN_queue.py --variates numpy`, every job completes at exactly the same time as in mmNNN_queue, whatever the number
+of workers.
+
+The statistics are those of mmNNN_queue too: each group logs the calls its events make to a stats.QueueStats (job
+arrived, job completed, server busy, server idle) and sends the log back after every round. Everything up to the
+smallest clock the groups have reached is final, so the dispatcher merges those logs by time and feeds them to a single
+QueueStats in the order of the sequential run, and the summary is identical to mmNNN_queue's (unless events of
+different groups fall at exactly the same time). That replay is sequential work in the dispatcher, about as costly as
+the statistics of the sequential model, which bounds the speed-up.
+
+    python parallel_sim.py --n 20000 --lambd 16000 --max-t 1e6 --workers 8 --policy random --seed 1
+    python parallel_sim.py --check   # compare completion times and summaries with mmNNN_queue, on a trace and seeded
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+from array import array
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from discrete_event_sim_V01 import Simulation, BaseEvent, EVENT_QUEUES
+from dispatch import DISPATCHERS
+from stats import QueueStats
+from variates import add_variate_arguments, variates_from_args
+from workload import GeneratedWorkload, add_workload_arguments, interarrival_blocks
+
+BLOCK_SIZE = 1 << 16
+
+# an arrival sent by the dispatcher to a server group
+MESSAGE = np.dtype([('job', '<i8'), ('arrival', '<f8'), ('service', '<f8'), ('server', '<i8')])
+
+# dispatch policies that do not depend on the state of the servers
+INDEPENDENT_POLICIES = ('random', 'round-robin')
+
+# kinds of the QueueStats calls logged by the server groups: (time, kind, arrival time or server) records
+ARRIVED, COMPLETED, BUSY, IDLE = range(4)
+
+
+def replay(stats, log):
+    """Make the QueueStats calls of a (time, kind, value) log, in its order."""
+    for t, kind, value in log.tolist():
+        if kind == ARRIVED:
+            stats.job_arrived(t)
+        elif kind == COMPLETED:
+            stats.job_completed(t, value)
+        elif kind == BUSY:
+            stats.server_busy(int(value), t)
+        else:
+            stats.server_idle(int(value), t)
+
+
+class RingBuffer:
+    """Channel of arrival messages from the dispatcher to one server group: `slots` blocks of up to `capacity`
+    messages in shared memory, each with its message count and channel clock.
+
+    The free and filled semaphores count the slots available to the producer and to the consumer; they also order the
+    writes of one process before the reads of the other. Pickling the buffer (to start the consumer process) hands over
+    the name of the shared memory block and the semaphores. If `consumer` is set to the consumer process, put() raises
+    RuntimeError instead of waiting forever when that process has died.
+    """
+
+    def __init__(self, slots=8, capacity=BLOCK_SIZE):
+        self.slots = slots
+        self.capacity = capacity
+        self.memory = shared_memory.SharedMemory(create=True, size=slots * (16 + capacity * MESSAGE.itemsize))
+        self.free = multiprocessing.get_context('spawn').Semaphore(slots)
+        self.filled = multiprocessing.get_context('spawn').Semaphore(0)
+        self.owner = True
+        self.consumer = None
+        self.next = 0  # the next slot to write, or to read
+        self._attach()
+
+    def _attach(self):
+        self.headers = np.ndarray((self.slots, 2), dtype='<f8', buffer=self.memory.buf)  # count, clock
+        self.records = np.ndarray((self.slots, self.capacity), dtype=MESSAGE, buffer=self.memory.buf,
+                                  offset=self.headers.nbytes)
+
+    def __getstate__(self):
+        return {'name': self.memory.name, 'slots': self.slots, 'capacity': self.capacity, 'free': self.free,
+                'filled': self.filled}
+
+    def __setstate__(self, state):
+        self.slots, self.capacity = state['slots'], state['capacity']
+        self.free, self.filled = state['free'], state['filled']
+        self.memory = shared_memory.SharedMemory(name=state['name'])
+        self.owner = False
+        self.consumer = None
+        self.next = 0
+        self._attach()
+
+    def put(self, messages, clock):
+        """Send messages (sorted by arrival time) with the promise that no later message arrives before clock. An
+        empty array makes a null message."""
+        start = 0
+        while True:
+            chunk = messages[start:start + self.capacity]
+            start += len(chunk)
+            while not self.free.acquire(timeout=1):
+                if self.consumer is not None and not self.consumer.is_alive():
+                    raise RuntimeError(f"server group process {self.consumer.name} died")
+            slot = self.next
+            self.records[slot, :len(chunk)] = chunk
+            self.headers[slot] = len(chunk), clock if start == len(messages) else chunk['arrival'][-1]
+            self.next = (slot + 1) % self.slots
+            self.filled.release()
+            if start == len(messages):
+                return
+
+    def get(self):
+        """The next block of messages and its clock, waiting for it if needed."""
+        self.filled.acquire()
+        slot = self.next
+        count, clock = self.headers[slot]
+        messages = self.records[slot, :int(count)].copy()
+        self.next = (slot + 1) % self.slots
+        self.free.release()
+        return messages, float(clock)
+
+    def close(self):
+        self.headers = self.records = None  # the views must go before the memory is closed
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class ServerGroup(Simulation):
+    """The LP simulating servers first, ..., first + count - 1 of the multi-queue model.
+
+    Its state mirrors mmNNN_queue.MMN for its own servers (indexed from 0 here), and jobs come from the dispatcher
+    with their arrival and service times. Instead of updating statistics, the events log the QueueStats calls
+    mmNNN_queue would make (see replay()), which take_log() hands over after every round.
+    """
+
+    def __init__(self, first, count, event_queue='heap', record=False):
+        super().__init__(event_queue)
+        self.enable_event_pool()
+        self.first = first
+        self.count = count
+        self.running = array('q', [-1]) * count
+        self.head = array('q', [-1]) * count
+        self.tail = array('q', [-1]) * count
+        self.successor = {}  # job id -> next job waiting at the same server
+        self.arrivals = {}  # arrival time of each job in the group
+        self.services = {}  # service time of each job that has not started service yet
+        self.service_start = array('d', [0.0]) * count
+        self.log = array('d')  # (time, kind, value) records of the current round
+        self.record = array('d') if record else None  # if not None, (job id, completion time) pairs
+
+    def deliver(self, messages):
+        """Schedule the arrivals of a block of messages at their (absolute) arrival times."""
+        first, queue, new_event = self.first, self.event_queue, self.new_event
+        for job, arrival, service, server in zip(messages['job'].tolist(), messages['arrival'].tolist(),
+                                                 messages['service'].tolist(), messages['server'].tolist()):
+            self.services[job] = service
+            event = new_event(Arrival, job, server - first)
+            event.priority = arrival
+            queue.push(event, arrival)
+
+    def enqueue(self, job_id, server_index):
+        if self.tail[server_index] == -1:
+            self.head[server_index] = job_id
+        else:
+            self.successor[self.tail[server_index]] = job_id
+        self.tail[server_index] = job_id
+
+    def dequeue(self, server_index):
+        job_id = self.head[server_index]
+        if job_id != -1:
+            next_job = self.successor.pop(job_id, -1)
+            self.head[server_index] = next_job
+            if next_job == -1:
+                self.tail[server_index] = -1
+        return job_id
+
+    def take_log(self):
+        """The (time, kind, value) records logged since the last call, as an (n, 3) array."""
+        log = np.frombuffer(self.log).reshape(-1, 3).copy()
+        self.log = array('d')
+        return log
+
+
+class Arrival(BaseEvent):
+    __slots__ = ('id', 'server_index')
+    recyclable = True
+
+    def __init__(self, job_id, server_index):
+        self.id = job_id
+        self.server_index = server_index
+
+    def process(self, sim: ServerGroup):
+        server_index = self.server_index
+        sim.arrivals[self.id] = sim.t
+        sim.log.extend((sim.t, ARRIVED, 0.0))
+        if sim.running[server_index] == -1:
+            sim.running[server_index] = self.id
+            sim.service_start[server_index] = sim.t
+            sim.log.extend((sim.t, BUSY, sim.first + server_index))
+            sim.schedule(sim.services.pop(self.id), sim.new_event(Completion, self.id, server_index))
+        else:
+            sim.enqueue(self.id, server_index)
+
+
+class Completion(BaseEvent):
+    __slots__ = ('id', 'server_index')
+    recyclable = True
+
+    def __init__(self, job_id, server_index):
+        self.id = job_id
+        self.server_index = server_index
+
+    def process(self, sim: ServerGroup):
+        server_index = self.server_index
+        job_id = sim.running[server_index]
+        sim.log.extend((sim.t, COMPLETED, sim.arrivals.pop(job_id)))
+        if sim.record is not None:
+            sim.record.extend((job_id, sim.t))
+        next_job = sim.dequeue(server_index)
+        sim.running[server_index] = next_job
+        if next_job != -1:
+            sim.service_start[server_index] = sim.t
+            sim.schedule(sim.services.pop(next_job), sim.new_event(Completion, next_job, server_index))
+        else:
+            sim.log.extend((sim.t, IDLE, sim.first + server_index))
+
+
+class LogMerger:
+    """Replays the logs of the server groups into a QueueStats, in time order, as far as all the groups have got."""
+
+    def __init__(self, stats, workers):
+        self.stats = stats
+        self.pending = [[] for _ in range(workers)]  # log arrays of each group not replayed yet
+        self.clocks = [-math.inf] * workers  # the time each group has reached
+        self.records = {}  # group index -> completion record, once the group has finished
+        self.last = 0.0  # the time of the last event replayed
+
+    def add(self, index, clock, log):
+        """A message of _run_group: the log of a round, or (clock None) the final completion record."""
+        if clock is None:
+            self.records[index] = log
+            return
+        if len(log):
+            self.pending[index].append(log)
+        self.clocks[index] = clock
+
+    def replay(self):
+        """Replay the events up to the time reached by every group, merged by time (ties in group order)."""
+        until = min(self.clocks)
+        parts = []
+        for index, pending in enumerate(self.pending):
+            if pending:
+                log = np.concatenate(pending)
+                cut = int(np.searchsorted(log[:, 0], until, side='right'))
+                parts.append(log[:cut])
+                self.pending[index] = [log[cut:]] if cut < len(log) else []
+        if parts:
+            log = np.concatenate(parts)
+            if len(log):
+                replay(self.stats, log[np.argsort(log[:, 0], kind='stable')])
+                self.last = max(self.last, float(log[:, 0].max()))
+
+
+def _run_group(ring, results, index, first, count, horizon, event_queue, record):
+    """Worker process: simulate one server group, round by round, as far as the channel clock allows, sending the log
+    of every round with the time it reached, then the completion record."""
+    group = ServerGroup(first, count, event_queue, record)
+    while True:
+        messages, clock = ring.get()
+        group.deliver(messages)
+        group.run(min(clock, horizon))
+        results.put((index, min(clock, horizon), group.take_log()))
+        if clock >= horizon:
+            break
+    ring.close()
+    results.put((index, None, np.frombuffer(group.record).reshape(-1, 2) if record else None))
+
+
+def numpy_variates(lambd, mu, n, seed=None):
+    """The exponential samplers of `mmNNN_queue.py --variates numpy --seed seed`, which also seeds the random module."""
+    args = argparse.Namespace(variates='numpy', service_dist='exp', shape=None, seed=seed)
+    return variates_from_args(args, lambd / n, mu / n)
+
+
+def job_blocks(interarrival=None, service=None, trace=None, timestamps=False, rate_scale=1.0, block_size=BLOCK_SIZE):
+    """(interarrival times, service times) arrays of consecutive jobs: read from a trace (as workload.TraceWorkload
+    does), or drawn from the samplers by a workload.GeneratedWorkload, several of its blocks at a time."""
+    if trace is not None:
+        for block in interarrival_blocks(trace, block_size, timestamps):
+            yield block[:, 0] / rate_scale, block[:, 1]
+        return
+    workload = GeneratedWorkload(interarrival, service)
+    blocks = workload.blocks()
+    while True:
+        drawn = [next(blocks) for _ in range(max(block_size // workload.block_size, 1))]
+        yield np.concatenate([block[0] for block in drawn]), np.concatenate([block[1] for block in drawn])
+
+
+def simulate_parallel(lambd, mu, n, max_t=math.inf, policy='round-robin', workers=None, interarrival=None,
+                      service=None, seed=None, trace=None, timestamps=False, rate_scale=1.0, event_queue='heap',
+                      block_size=BLOCK_SIZE, record=False):
+    """Summary of a run of the multi-queue model up to max_t, with the keys of stats.QueueStats.summary().
+
+    Jobs come from job_blocks(), by default from numpy_variates(lambd, mu, n, seed) when there is no trace; the random
+    policy draws from the random module, as mmNNN_queue does. With a trace and max_t infinite, the run lasts until the
+    last job has left. With record=True, the summary also holds 'completion', the completion time of every job
+    generated (NaN for the jobs not completed by max_t).
+    """
+    if policy not in INDEPENDENT_POLICIES:
+        raise ValueError(f"the {policy} policy depends on the state of all the servers: use mmNNN_queue")
+    if trace is None and (interarrival is None or service is None):
+        interarrival, service = numpy_variates(lambd, mu, n, seed)
+    workers = min(workers or os.cpu_count(), n)
+    bounds = [w * n // workers for w in range(workers + 1)]
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    rings = [RingBuffer(capacity=block_size) for _ in range(workers)]
+    processes = [context.Process(target=_run_group, daemon=True,
+                                 args=(rings[w], results, w, bounds[w], bounds[w + 1] - bounds[w], max_t, event_queue,
+                                       record))
+                 for w in range(workers)]
+    for ring, process in zip(rings, processes):
+        process.start()
+        ring.consumer = process
+
+    merger = LogMerger(QueueStats(n), workers)
+
+    def receive(wait):
+        """Hand the messages of the groups to the merger: those already there, or (wait) at least one."""
+        while True:
+            try:
+                merger.add(*(results.get(timeout=1) if wait else results.get_nowait()))
+                wait = False
+            except queue.Empty:
+                if not wait:
+                    return
+                for index, process in enumerate(processes):
+                    if index not in merger.records and process.exitcode not in (None, 0):
+                        raise RuntimeError(f"server group process {process.name} died")
+
+    try:
+        choose = DISPATCHERS[policy](n, 2).choose
+        t = 0.0
+        jobs = 0
+        last = False
+        for interarrivals, services in job_blocks(interarrival, service, trace, timestamps, rate_scale, block_size):
+            # arrival times added up one by one from the previous one, like the events of the sequential model
+            arrivals = np.cumsum(np.concatenate([[t], interarrivals]))[1:]
+            last = arrivals[-1] > max_t
+            if last:
+                size = int(np.searchsorted(arrivals, max_t, side='right'))
+                arrivals, services = arrivals[:size], services[:size]
+            size = len(arrivals)
+            messages = np.empty(size, dtype=MESSAGE)
+            messages['job'] = np.arange(jobs, jobs + size)
+            messages['arrival'] = arrivals
+            messages['service'] = services
+            messages['server'] = np.fromiter((choose(None) for _ in range(size)), dtype=np.int64, count=size)
+            owners = np.searchsorted(bounds, messages['server'], side='right') - 1
+            messages = messages[np.argsort(owners, kind='stable')]
+            ends = np.cumsum(np.bincount(owners, minlength=workers)).tolist()
+            clock = float(arrivals[-1]) if size else t
+            for ring, start, end in zip(rings, [0] + ends, ends):
+                ring.put(messages[start:end], clock)
+            jobs += size
+            t = clock
+            receive(wait=False)
+            merger.replay()
+            if last:
+                break
+        for ring in rings:
+            ring.put(np.empty(0, dtype=MESSAGE), math.inf)
+        while len(merger.records) < workers:
+            receive(wait=True)
+        merger.replay()
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for ring in rings:
+            ring.close()
+
+    # the sequential run stops at max_t if events are left after it, otherwise at its last event
+    stats = merger.stats
+    summary = stats.summary(max_t if last or stats.in_system else merger.last)
+    if record:
+        completion = np.full(jobs, math.nan)
+        for part in merger.records.values():
+            completion[part[:, 0].astype(np.int64)] = part[:, 1]
+        summary['completion'] = completion
+    return summary
+
+
+def check(n, jobs, lambd, policy, seed=1, workers=(1, 2, 4), trace=True):
+    """Run the same jobs through mmNNN_queue and through the parallel kernel with each number of workers: `jobs` jobs
+    replayed from a trace, or (trace=False) generated from the seed as with --variates numpy, with `jobs` arriving on
+    average over twice the run.
+
+    Returns the number of jobs whose completion time differs from the sequential run and whether the summaries of all
+    the parallel runs are identical to the summary of mmNNN_queue.
+    """
+    import mmNNN_queue
+    from job_trace import JobTraceWriter
+    from trace_analysis import load_trace
+    from workload import TraceWorkload
+
+    with tempfile.TemporaryDirectory() as directory:
+        if trace:
+            rng = np.random.default_rng(seed)
+            interarrivals = rng.standard_exponential(jobs) / (lambd / n)
+            services = rng.standard_exponential(jobs) / (1 / n)
+            # half the jobs arrive in time, and some are still there at the end
+            max_t = float(np.sum(interarrivals)) / 2
+            path = os.path.join(directory, 'jobs.npy')
+            np.save(path, np.column_stack([interarrivals, services]))
+            interarrival = service = None
+            workload = TraceWorkload(path)
+        else:
+            max_t = jobs / (lambd / n) / 2
+            path = workload = None
+            interarrival, service = numpy_variates(lambd, 1, n, seed)
+        random.seed(seed)
+        sim = mmNNN_queue.MMN(lambd, 1, n, policy=policy, interarrival=interarrival, service=service, workload=workload)
+        sim.job_trace = JobTraceWriter(os.path.join(directory, 'trace'))
+        sim.run(max_t)
+        sim.job_trace.close()
+        sequential = sim.stats.summary(sim.t)
+        completed = load_trace(os.path.join(directory, 'trace'))
+        expected = np.full(int(completed['job'].max()) + 1, math.nan)
+        expected[completed['job']] = completed['completion']
+        summaries = []
+        mismatches = 0
+        for count in workers:
+            random.seed(seed)
+            summary = simulate_parallel(lambd, 1, n, max_t, policy, count, seed=seed, trace=path, record=True)
+            completion = summary.pop('completion')
+            size = max(len(completion), len(expected))  # jobs generated, whether completed or not
+            compared, reference = np.full(size, math.nan), np.full(size, math.nan)
+            compared[:len(completion)] = completion
+            reference[:len(expected)] = expected
+            same = (compared == reference) | (np.isnan(compared) & np.isnan(reference))
+            mismatches += int(np.count_nonzero(~same))
+            summaries.append(summary)
+    return mismatches, all(summary == sequential for summary in summaries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lambd', type=float, default=0.7)
+    parser.add_argument('--mu', type=float, default=1)
+    parser.add_argument('--max-t', type=float, default=1_000_000)
+    parser.add_argument('--n', type=int, default=2)
+    parser.add_argument('--policy', choices=INDEPENDENT_POLICIES, default='round-robin', help="load-balancing policy")
+    parser.add_argument('--workers', type=int, help="server groups, each in its own process (default: one per core)")
+    parser.add_argument('--event-queue', choices=EVENT_QUEUES, default='heap', help="event-set backend of the groups")
+    parser.add_argument('--check', action='store_true',
+                        help="compare the job completion times and the summary with mmNNN_queue on the same jobs, "
+                             "for both policies, replayed from a trace and generated from a seed")
+    add_variate_arguments(parser)
+    add_workload_arguments(parser)
+    args = parser.parse_args()
+
+    if args.check:
+        failed = False
+        for policy in INDEPENDENT_POLICIES:
+            for trace in (True, False):
+                mismatches, identical = check(100, 200_000, 80, policy, trace=trace)
+                failed |= mismatches > 0 or not identical
+                print(f"{policy}, {'trace' if trace else 'seeded'} jobs: {mismatches} jobs with a different completion "
+                      f"time, summary {'identical to' if identical else 'different from'} mmNNN_queue's "
+                      f"with 1, 2 and 4 workers")
+        if failed:
+            raise SystemExit("the parallel and sequential kernels disagree")
+        return
+
+    interarrival, service = variates_from_args(args, args.lambd / args.n, args.mu / args.n)
+    summary = simulate_parallel(args.lambd, args.mu, args.n, args.max_t, args.policy, args.workers, interarrival,
+                                service, args.seed, args.workload, args.timestamps, args.rate_scale, args.event_queue)
+    print(f"Average time spent in the system: {summary['W']}")
+    print(f"Sojourn time percentiles: 50% {summary['W_p50']:.3f}, 90% {summary['W_p90']:.3f}, "
+          f"99% {summary['W_p99']:.3f}")
+    print(f"Average number of jobs in the system: {summary['L']:.3f}, server utilisation: {summary['utilisation']:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Per-event-type profiling of Simulation.run.
+
+Profiling is off unless a profiler is attached to the simulation (sim.profiler = Profiler()). Simulation.run then
+uses a separate, instrumented loop, so the normal loop is not slowed down at all when profiling is off. For every
+event class the profiler records how many events were processed, the total wall-clock time spent in their process()
+methods and the 50th/90th/99th percentiles and maximum of that time; it also keeps the high-water mark of the event
+queue size and, every `sample_every` events, the processing rate in events per wall-clock second.
+
+    sim.profiler = Profiler()
+    sim.run(max_t)
+    sim.profiler.print_summary()
+    sim.profiler.write_chrome_trace('profile.json')  # open in chrome://tracing, Perfetto or speedscope
+
+The Chrome trace holds one span per event for the first `max_spans` events (the later ones are only counted), plus
+counter tracks of the event queue size and of the event rate over the whole run.
+"""
+
+import json
+import sys
+import time
+
+from stats import P2Quantile, RunningStats
+
+
+class EventProfile:
+    """Processing times, in seconds, of the events of one class."""
+
+    def __init__(self):
+        self.times = RunningStats()
+        self.quantiles = {p: P2Quantile(p) for p in (0.5, 0.9, 0.99)}
+        self.total = 0.0
+
+    def add(self, elapsed):
+        self.times.add(elapsed)
+        self.total += elapsed
+        for quantile in self.quantiles.values():
+            quantile.add(elapsed)
+
+
+class Profiler:
+
+    def __init__(self, sample_every=10_000, max_spans=100_000):
+        self.sample_every = sample_every
+        self.max_spans = max_spans
+        self.profiles = {}  # event class name -> EventProfile
+        self.events = 0
+        self.max_queue = 0  # high-water mark of the event queue size
+        self.wall_time = 0.0  # wall-clock duration of the profiled runs
+        self.samples = []  # (wall-clock time, simulated time, events per second, queue size) every sample_every events
+        self.spans = []  # (event class name, wall-clock start, duration, simulated time) of the first max_spans events
+        self.start = None
+
+    def run_started(self):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        self.last_sample = now
+        return now
+
+    def run_finished(self, started):
+        self.wall_time += time.perf_counter() - started
+
+    def event(self, name, started, elapsed, sim_t, queue_size):
+        """Record an event of class `name`, processed from wall-clock time started for elapsed seconds."""
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = EventProfile()
+        profile.add(elapsed)
+        if queue_size > self.max_queue:
+            self.max_queue = queue_size
+        if len(self.spans) < self.max_spans:
+            self.spans.append((name, started - self.start, elapsed, sim_t))
+        self.events += 1
+        if self.events % self.sample_every == 0:
+            now = time.perf_counter()
+            self.samples.append((now - self.start, sim_t, self.sample_every / (now - self.last_sample), queue_size))
+            self.last_sample = now
+
+    def summary(self):
+        """One row per event class, most expensive first: name, count, total, share of total, mean, p50, p90, p99,
+        max (times in seconds)."""
+        profiled = sum(profile.total for profile in self.profiles.values())
+        rows = []
+        for name, profile in self.profiles.items():
+            times = profile.times
+            rows.append((name, times.count, profile.total, profile.total / profiled if profiled else 0.0, times.mean,
+                         *(quantile.value for quantile in profile.quantiles.values()), times.max))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def print_summary(self, file=sys.stderr):
+        print(f"{'event':<16}{'count':>10}{'total s':>10}{'share':>8}{'mean us':>10}"
+              f"{'p50 us':>10}{'p90 us':>10}{'p99 us':>10}{'max us':>10}", file=file)
+        for name, count, total, share, mean, p50, p90, p99, maximum in self.summary():
+            print(f"{name:<16}{count:>10}{total:>10.3f}{share:>8.1%}"
+                  + ''.join(f"{value * 1e6:>10.2f}" for value in (mean, p50, p90, p99, maximum)), file=file)
+        rate = self.events / self.wall_time if self.wall_time > 0 else 0.0
+        print(f"{self.events} events in {self.wall_time:.3f} s ({rate:,.0f} events/s), "
+              f"event queue high-water mark {self.max_queue}", file=file)
+
+    def write_chrome_trace(self, path):
+        """Write the spans and counters in the Chrome trace event format (times in microseconds)."""
+        events = [{'name': name, 'cat': 'event', 'ph': 'X', 'ts': start * 1e6, 'dur': elapsed * 1e6,
+                   'pid': 0, 'tid': 0, 'args': {'t': sim_t}}
+                  for name, start, elapsed, sim_t in self.spans]
+        for wall, sim_t, rate, queue_size in self.samples:
+            events.append({'name': 'events/s', 'ph': 'C', 'ts': wall * 1e6, 'pid': 0, 'args': {'rate': rate}})
+            events.append({'name': 'event queue', 'ph': 'C', 'ts': wall * 1e6, 'pid': 0, 'args': {'size': queue_size}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def add_profile_arguments(parser):
+    """Add the --profile and --profile-trace options shared by the command line scripts."""
+    parser.add_argument('--profile', action='store_true',
+                        help="print a per-event-type profile of the run to stderr")
+    parser.add_argument('--profile-trace', help="also write the profile to this file in the Chrome trace format")
+
+
+def profiler_from_args(args):
+    """The Profiler requested on the command line, or None."""
+    if not args.profile and args.profile_trace is None:
+        return None
+    return Profiler()
+
+
+def report_profile(profiler, args):
+    """Print and write the profile as requested on the command line (nothing if profiler is None)."""
+    if profiler is None:
+        return
+    profiler.print_summary()
+    if args.profile_trace is not None:
+        profiler.write_chrome_trace(args.profile_trace)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Independent replications of a model across a process pool, with confidence intervals.
+
+Each replication runs in a worker process with its own seed: the base seed is turned into a numpy.random.SeedSequence
+and spawned into one child per replication, whose 64-bit integer state seeds the random module (and the NumPy
+variate stream, if any) of that replication. The streams are independently seeded, not provably disjoint: seeding
+the Mersenne Twister from different integers makes overlaps very unlikely but does not exclude them. The results do
+not depend on the number of workers or on the order in which replications finish.
+
+Example:
+
+    python replication.py mmn_queue2 --reps 32 --set lambd=0.9 --set n=4 --set max_t=100000
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import random
+
+import numpy as np
+
+from stats import confidence_interval
+from variates import variates_from_args
+
+# default parameters of every model; run_replication() builds the model from these, updated with the user's values
+MODELS = {
+    'mmn_queue': {'lambd': 0.7, 'mu': 1, 'n': 1, 'max_t': 100_000},
+    'mmn_queue2': {'lambd': 0.7, 'mu': 1, 'n': 2, 'max_t': 100_000},
+    'mmNNN_queue': {'lambd': 0.7, 'mu': 1, 'n': 2, 'max_t': 100_000, 'policy': 'round-robin', 'd': 2},
+    'sir': {'population': 1000, 'infected': 1, 'avg_contact_time': 1, 'avg_recovery_time': 3, 'plot_interval': 1},
+}
+
+# optional parameters of the MMN models choosing how variates are generated, with their defaults (as the --variates,
+# --service-dist and --shape options of the scripts)
+VARIATE_PARAMETERS = {'variates': 'python', 'service_dist': 'exp', 'shape': 2}
+
+
+def parameter_names(model):
+    """The parameters that can be set for a model."""
+    if model == 'sir':
+        return set(MODELS[model]) | {'graph'}
+    return set(MODELS[model]) | set(VARIATE_PARAMETERS)
+
+
+def check_parameters(parser, model, names):
+    """Exit with a usage error if some of the names are not parameters of model."""
+    unknown = sorted(set(names) - parameter_names(model))
+    if unknown:
+        parser.error(f"unknown parameter(s) of {model}: {', '.join(unknown)} "
+                     f"(known: {', '.join(sorted(parameter_names(model)))})")
+
+
+def run_mmn(module, params, seed):
+    """Run one of the MMN variants and return its summary statistics.
+
+    The variate parameters are turned into samplers as on the command line, so a run gives the same result as the
+    script with the same options and --seed.
+    """
+    options = {key: value for key, value in params.items()
+               if key not in ('lambd', 'mu', 'n', 'max_t') and key not in VARIATE_PARAMETERS}
+    settings = argparse.Namespace(seed=seed, **{key: params.get(key, default)
+                                                for key, default in VARIATE_PARAMETERS.items()})
+    interarrival, service = variates_from_args(settings, params['lambd'] / params['n'], params['mu'] / params['n'])
+    sim = module.MMN(params['lambd'], params['mu'], params['n'], interarrival=interarrival, service=service,
+                     **options)
+    sim.run(params['max_t'])
+    return sim.stats.summary(sim.t)
+
+
+def run_sir(module, params):
+    """Run the SIR model and return the duration, the peak of infections and the final number of recovered.
+
+    If params has a 'graph' directory, the graph is memory-mapped, so workers share its pages instead of copying it.
+    """
+    graph = None
+    if params.get('graph') is not None:
+        from contact_graph import CSRGraph
+        graph = CSRGraph.load(params['graph'])
+    sim = module.SIR(graph.n if graph is not None else params['population'], params['infected'],
+                     1 / params['avg_contact_time'], 1 / params['avg_recovery_time'], params['plot_interval'],
+                     graph=graph)
+    sim.run()
+    return {'duration': sim.t, 'peak_infected': max(sim.i), 'recovered': sim.r[-1]}
+
+
+def run_replication(task):
+    """Worker entry point: task is (model name, parameters, seed)."""
+    model, params, seed = task
+    random.seed(seed)
+    module = importlib.import_module(model)
+    if model == 'sir':
+        return run_sir(module, params)
+    return run_mmn(module, params, seed)
+
+
+def replication_seeds(seed, reps):
+    """One 64-bit integer seed per replication, spawned from `seed` (distinct and statistically independent seeds,
+    not disjoint streams: see the module documentation)."""
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(reps)]
+
+
+def aggregate(results, confidence=0.95):
+    """Turn a list of per-run metric dictionaries into {metric: (mean, half-width)}."""
+    return {metric: confidence_interval([result[metric] for result in results], confidence) for metric in results[0]}
+
+
+def replicate(model, params=None, reps=10, seed=0, workers=None, confidence=0.95):
+    """Run `reps` independent replications of `model` and return (per-run results, aggregated results)."""
+    params = {**MODELS[model], **(params or {})}
+    tasks = [(model, params, s) for s in replication_seeds(seed, reps)]
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(run_replication, tasks, chunksize=1)
+    return results, aggregate(results, confidence)
+
+
+def parse_assignment(text):
+    """Parse a --set key=value option; values are converted to int or float when possible."""
+    key, _, value = text.partition('=')
+    for convert in (int, float):
+        try:
+            return key, convert(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('model', choices=MODELS)
+    parser.add_argument('--reps', type=int, default=10, help="number of independent replications")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--seed', type=int, default=0, help="base seed from which the replication seeds are spawned")
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--set', action='append', default=[], type=parse_assignment, metavar='KEY=VALUE',
+                        help="model parameter, e.g. --set lambd=0.9 (defaults: see MODELS)")
+    args = parser.parse_args()
+    check_parameters(parser, args.model, dict(args.set))
+
+    _, summary = replicate(args.model, dict(args.set), args.reps, args.seed, args.workers, args.confidence)
+    print(f"{args.reps} replications, {args.confidence:.0%} confidence intervals:")
+    for metric, (mean, half_width) in summary.items():
+        print(f"{metric:>15}: {mean:.4f} ± {half_width:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Persistent memo of simulation results, shared by the sweeps and the command line scripts.
+
+A run is identified by its model, parameters and seed: seeded runs are deterministic, so a result found in the cache
+is exactly what running again would print. The cache is a SQLite database (one row per run, the result stored as
+JSON), which several processes can read and write at the same time.
+
+    cache = ResultCache('results.sqlite')
+    result = cache.get('mmn_queue2', params, seed)
+    if result is None:
+        result = run(...)
+        cache.put('mmn_queue2', params, seed, result)
+"""
+
+import hashlib
+import json
+import sqlite3
+
+
+def normalise(params):
+    """params with numbers as floats (argparse gives 1.0 where replication.MODELS has 1) and the variate parameters
+    either all given or, when they are all at their defaults, left out."""
+    from replication import VARIATE_PARAMETERS
+
+    params = {key: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+              for key, value in params.items()}
+    if any(key in params for key in VARIATE_PARAMETERS):
+        defaults = {key: float(value) if isinstance(value, int) else value
+                    for key, value in VARIATE_PARAMETERS.items()}
+        params = {**defaults, **params}
+        if all(params[key] == value for key, value in defaults.items()):
+            params = {key: value for key, value in params.items() if key not in defaults}
+    return params
+
+
+def result_key(model, params, seed):
+    """The cache key of one run, the same for equal parameters whatever their order and number types."""
+    text = json.dumps({'model': model, 'params': normalise(params), 'seed': seed}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                '(key TEXT PRIMARY KEY, model TEXT, params TEXT, seed TEXT, result TEXT)')
+        self.connection.commit()
+
+    def get(self, model, params, seed):
+        """The stored result of a run, or None."""
+        row = self.connection.execute('SELECT result FROM results WHERE key = ?',
+                                      (result_key(model, params, seed),)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, model, params, seed, result):
+        self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                                (result_key(model, params, seed), model, json.dumps(normalise(params), sort_keys=True),
+                                 str(seed), json.dumps(result)))  # as text: sweep seeds don't fit SQLite's integers
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def add_cache_arguments(parser):
+    """Add the --cache and --analytical options of the MMN scripts."""
+    parser.add_argument('--cache', help="SQLite file of previous results: seeded runs found there are not simulated "
+                                        "again, and new ones are added")
+    parser.add_argument('--analytical', action='store_true',
+                        help="print the exact analytical result instead of simulating, when there is one")
+
+
+def run_parameters(args, model):
+    """The parameters identifying a command line run in the cache, in the form used by replication.MODELS.
+
+    A run of a script with --seed s shares its entry with a sweep.py replication of the same point whose seed is s
+    (the seed column of the sweep's store): sweeps spawn their seeds from --seed, the scripts use it as it is.
+    """
+    params = {'lambd': args.lambd, 'mu': args.mu, 'n': args.n, 'max_t': args.max_t}
+    if model == 'mmNNN_queue':
+        params.update(policy=args.policy, d=args.d)
+    if getattr(args, 'engine', 'event') != 'event':
+        params['engine'] = args.engine
+    if args.variates != 'python' or args.service_dist != 'exp':
+        params.update(variates=args.variates, service_dist=args.service_dist, shape=args.shape)
+    return params
+
+
+def cache_from_args(args):
+    """The ResultCache to use for a command line run, or None if there is none or the run can't be cached: unseeded
+    runs, and runs with options that change the result or whose point is a side effect (checkpoints, traces...)."""
+    from lindley import EVENT_ONLY_OPTIONS
+
+    if args.cache is None or args.seed is None:
+        return None
+    if any(getattr(args, name, None) for name in EVENT_ONLY_OPTIONS):
+        return None
+    return ResultCache(args.cache)
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 import argparse
-import collections
 # import enum
 from enum import Enum
 # Enum is a set of symbolic names (members) bound to unique values
@@ -11,9 +10,11 @@ from enum import Enum
 import logging
 import random
 
-from matplotlib import pyplot as plt
-
-from discrete_event_sim_V01 import Simulation, Event
+from checkpoint import Checkpoint, add_checkpoint_arguments, load_snapshot
+from discrete_event_sim_V01 import Simulation, BaseEvent, EVENT_QUEUES
+from monitor import Monitor, TimeSeries, read_series
+from profiler import add_profile_arguments, profiler_from_args, report_profile
+from tracing import add_trace_arguments, tracer_from_args
 
 
 class Condition(Enum):
@@ -30,38 +31,85 @@ class SIR(Simulation):
     We have the simulation parameters contact_rate and recovery_rate, plus the condition of every individual, as a
     list: conditions[i] represent the condition of the i-th individuals.
 
-    s, i and r monitor the number of susceptible, infected and recovered individuals over time -- this is sampled
-    periodically through the MonitorSIR event.
+    If a contact graph is given, contacts are only made with neighbours in the graph.
+
+    The numbers of susceptible, infected and recovered individuals are kept up to date as counters, and sampled
+    periodically into self.series (a monitor.TimeSeries, unbounded unless one is passed) through the MonitorSIR
+    event; s, i and r are its columns.
     """
 
-    def __init__(self, population, infected, contact_rate, recovery_rate, plot_interval):
-        super().__init__()  # call the initialization method from Simulation
+    def __init__(self, population, infected, contact_rate, recovery_rate, plot_interval, event_queue='heap',
+                 tracer=None, graph=None, variates=None, series=None):
+        super().__init__(event_queue, tracer)  # call the initialization method from Simulation
+        if graph is not None and graph.n != population:
+            raise ValueError(f"the contact graph has {graph.n} nodes, not {population}")
+        self.graph = graph  # contact_graph.CSRGraph, or None for a fully mixed population
         self.contact_rate = contact_rate
         self.recovery_rate = recovery_rate
+        if variates is None:  # use the random module, one call per variate
+            self.contact_delay = self.recovery_delay = self.random_person = None
+        else:  # variates.VariateStream: samples drawn in NumPy blocks
+            self.contact_delay = variates.exponential(contact_rate)
+            self.recovery_delay = variates.exponential(recovery_rate)
+            self.random_person = variates.integers(population)
         self.conditions = [Condition.SUSCEPTIBLE] * population  # a list of identical items of length 'population'
+        self.susceptible, self.infected, self.recovered = population, 0, 0
         for i in random.sample(range(population), infected):  # starting infected individuals
             self.infect(i)
-        self.s, self.i, self.r = [], [], []  # values of susceptible, infected, recovered over time
-        self.schedule(0, MonitorSIR(plot_interval))
+        if series is None:
+            series = TimeSeries(('susceptible', 'infected', 'recovered'), key=1)
+        self.series = series  # values of susceptible, infected, recovered over time
+        self.schedule(0, MonitorSIR(series, self.counts, plot_interval))
+
+    def counts(self):
+        return self.susceptible, self.infected, self.recovered
+
+    @property
+    def s(self):
+        return self.series.column('susceptible')
+
+    @property
+    def i(self):
+        return self.series.column('infected')
+
+    @property
+    def r(self):
+        return self.series.column('recovered')
 
     def schedule_contact(self, patient):
         """Schedule a patient's next contact."""
 
-        other = random.randrange(len(self.conditions))  # choose a random contact
-        self.schedule(random.expovariate(self.contact_rate), Contact(patient, other))
+        if self.graph is None:
+            if self.random_person is None:
+                other = random.randrange(len(self.conditions))  # choose a random contact
+            else:
+                other = self.random_person()
+        else:
+            other = self.graph.random_neighbour(patient)  # choose a random neighbour in the contact graph
+            if other is None:
+                return  # isolated individuals have no contacts
+        delay = random.expovariate(self.contact_rate) if self.contact_delay is None else self.contact_delay()
+        self.schedule(delay, self.new_event(Contact, patient, other))
 
     def infect(self, i):
         """Patient i is infected."""
 
-        self.log_info(f"{i} infected")
+        if self.tracer is not None:
+            self.tracer.record(self.t, 'infect', i)
         self.conditions[i] = Condition.INFECTED
+        self.susceptible -= 1
+        self.infected += 1
         self.schedule_contact(i)  # schedule the patient's next contact
         # (further contacts will be scheduled by the Contact event, see the process() function)
-        self.schedule(random.expovariate(self.recovery_rate), Recover(i))  # schedule the patient's recovery
+        # schedule the patient's recovery
+        delay = random.expovariate(self.recovery_rate) if self.recovery_delay is None else self.recovery_delay()
+        self.schedule(delay, self.new_event(Recover, i))
 
 
-class Contact(Event):
+class Contact(BaseEvent):
     """A possible contagion event."""
+    __slots__ = ('source', 'destination')
+    recyclable = True
 
     def __init__(self, source, destination):
         """Parameters: indexes of both the source and the destination of the possible contagion."""
@@ -72,7 +120,8 @@ class Contact(Event):
     def process(self, sim):  # there is another process method in the Event class(method overriding)
         """If the patient is still infectious and the contact is susceptible, the latter will be infected."""
 
-        sim.log_info(f"{self.source} contacts {self.destination}")
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'contact', self.source, self.destination)
         if sim.conditions[self.source] != Condition.INFECTED:
             return  # healthy people can't infect
         if sim.conditions[self.destination] == Condition.SUSCEPTIBLE:
@@ -80,31 +129,28 @@ class Contact(Event):
         sim.schedule_contact(self.source)  # schedule the next contact
 
 
-class Recover(Event):
+class Recover(BaseEvent):
     """A sick patient recovers."""
+    __slots__ = ('patient',)
+    recyclable = True
 
     def __init__(self, patient):
         self.patient = patient
 
     def process(self, sim):
-        sim.log_info(f"{self.patient} recovered")
+        if sim.tracer is not None:
+            sim.tracer.record(sim.t, 'recover', self.patient)
         sim.conditions[self.patient] = Condition.RECOVERED
+        sim.infected -= 1
+        sim.recovered += 1
 
 
-class MonitorSIR(Event):
+class MonitorSIR(Monitor):
     """At any configurable interval, we save the number of susceptible, infected and recovered individuals."""
+    __slots__ = ()  # not recyclable: it reschedules itself
 
-    def __init__(self, interval=1):
-        self.interval = interval
-
-    def process(self, sim):
-        ctr = collections.Counter(sim.conditions)
-        infected = ctr[Condition.INFECTED]
-        sim.s.append(ctr[Condition.SUSCEPTIBLE])
-        sim.i.append(infected)
-        sim.r.append(ctr[Condition.RECOVERED])
-        if infected > 0:  # if nobody is infected anymore, the simulation is over.
-            sim.schedule(self.interval, self)
+    def done(self, sim):
+        return sim.infected == 0  # if nobody is infected anymore, the simulation is over.
 
 
 def main():
@@ -115,30 +161,86 @@ def main():
     parser.add_argument("--avg-contact-time", type=float, default=1)
     parser.add_argument("--avg-recovery-time", type=float, default=3)
     parser.add_argument("--verbose", action='store_true')
+    add_trace_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_profile_arguments(parser)
     parser.add_argument("--plot_interval", type=float, default=1, help="how often to collect data points for the plot")
+    parser.add_argument("--event-queue", choices=EVENT_QUEUES, default='heap', help="event-set backend")
+    parser.add_argument("--engine", choices=['event', 'gillespie', 'tau-leap'], default='event',
+                        help="event-driven simulation, or the aggregated engines of sir_gillespie (fully mixed only)")
+    parser.add_argument("--tau", type=float, help="step of the tau-leap engine")
+    parser.add_argument("--variates", choices=['python', 'numpy'], default='python',
+                        help="random module calls per event, or variates drawn in NumPy blocks (event engine)")
+    parser.add_argument("--graph", help="directory of a contact graph (see contact_graph.py); sets the population")
+    parser.add_argument("--max-points", type=int,
+                        help="keep at most this many samples, downsampled with LTTB (event engine)")
+    parser.add_argument("--monitor-file", help="stream the samples to this file instead of keeping them in memory")
+    parser.add_argument("--output", action='append', default=[],
+                        help="write the plot (.png, .svg, .pdf) or the data (.csv, .npz) to this file instead of "
+                             "showing the plot; can be repeated")
+    parser.add_argument("--no-plot", action='store_true', help="headless: don't plot (matplotlib is never imported)")
     args = parser.parse_args()
 
     if args.seed:
         random.seed(args.seed)  # set a seed to make experiments repeatable
     if args.verbose:
         logging.basicConfig(format='{levelname}:{message}', level=logging.INFO, style='{')  # output info on stdout
+    tracer = tracer_from_args(args)
 
     # the rates to use in random.expovariate are 1 over the desired mean
-    sim = SIR(args.population, args.infected, 1 / args.avg_contact_time, 1 / args.avg_recovery_time, args.plot_interval)
-    sim.run()
-    assert all(c != Condition.INFECTED for c in sim.conditions)  # nobody should be infected at the end of the sim
+    if args.engine == 'event':
+        graph = None
+        if args.graph is not None:
+            from contact_graph import CSRGraph
+            graph = CSRGraph.load(args.graph)
+            args.population = graph.n
+        variates = None
+        if args.variates == 'numpy':
+            from variates import VariateStream
+            variates = VariateStream(random.getrandbits(64))  # derived from --seed, if given
+        if args.restore is not None:
+            sim = load_snapshot(args.restore, args.seed)
+            sim.tracer = tracer
+        else:
+            series = TimeSeries(('susceptible', 'infected', 'recovered'), max_points=args.max_points, key=1,
+                                path=args.monitor_file)
+            sim = SIR(args.population, args.infected, 1 / args.avg_contact_time, 1 / args.avg_recovery_time,
+                      args.plot_interval, args.event_queue, tracer, graph, variates, series)
+            if args.checkpoint is not None:
+                sim.schedule_daemon(args.checkpoint_every, Checkpoint(args.checkpoint_every, args.checkpoint))
+        sim.profiler = profiler_from_args(args)
+        sim.run()
+        if tracer is not None:
+            tracer.close()
+        report_profile(sim.profiler, args)
+        assert all(c != Condition.INFECTED for c in sim.conditions)  # nobody should be infected at the end of the sim
+        if sim.series.path is not None:
+            data = read_series(sim.series.path)
+            days, s, i, r = data['t'], data['susceptible'], data['infected'], data['recovered']
+        else:
+            days, s, i, r = sim.series.times, sim.s, sim.i, sim.r  # the times at which values were taken
+    else:
+        if args.graph is not None:
+            parser.error("the aggregated engines only model fully mixed populations")
+        import numpy as np
+        from sir_gillespie import AggregatedSIR, INFECTED
+
+        rng = np.random.default_rng(random.getrandbits(64))  # derived from --seed, if given
+        sim = AggregatedSIR(args.population, args.infected, 1 / args.avg_contact_time, 1 / args.avg_recovery_time,
+                            args.plot_interval, args.engine, args.tau, rng)
+        sim.run()
+        assert not (sim.conditions == INFECTED).any()
+        days = [i * args.plot_interval for i in range(len(sim.s))]  # compute the times at which values were taken
+        s, i, r = sim.s, sim.i, sim.r
     print(f"Simulation over at time {sim.t:.2f}")
 
-    days = [i * args.plot_interval for i in range(len(sim.s))]  # compute the times at which values were taken
-    plt.plot(days, sim.s, label="Susceptible")
-    plt.plot(days, sim.i, label="Infected")
-    plt.plot(days, sim.r, label="Recovered")
-    plt.xlabel("Days")
-    plt.ylabel("Individuals")
-    plt.legend(loc=0)
-    plt.grid()
-    plt.show()
+    import sir_report
+    for path in args.output:
+        sir_report.report(days, s, i, r, path)
+    if not args.output and not args.no_plot:
+        sir_report.show(days, s, i, r)
 
 
-if __name__ == '__main__':  # run when this is run as a main file, not imported as a module
-    main()
+if __name__ == '__main__':
+    import sir  # run as the sir module, so that snapshots refer to sir.* and not to __main__.*
+    sir.main()
@@ -0,0 +1,132 @@
+"""Aggregated SIR engines for large, fully mixed populations.
+
+The event-driven sir.SIR schedules one event per contact and per recovery. In a fully mixed population the
+individuals are interchangeable, so the epidemic is a Markov chain on the counts (S, I, R) with two transitions:
+
+    infection  S, I -> S - 1, I + 1   at rate contact_rate * I * S / N   (a contact infects if it hits a susceptible)
+    recovery   I, R -> I - 1, R + 1   at rate recovery_rate * I
+
+AggregatedSIR simulates that chain either exactly (Gillespie's direct method: one step per transition, no event
+queue) or approximately by tau-leaping (binomial numbers of transitions over fixed steps of length tau), which costs
+a few vectorized NumPy operations per step regardless of the population size.
+
+Conditions are still tracked per individual, in an int8 array with the values of sir.Condition. Susceptible people
+are kept in a random order so that infecting one means taking the last of them; infected people are kept in an array
+from which recoveries are removed by swapping with the last one. s, i and r are sampled every plot_interval like
+sir.MonitorSIR does: from time 0 until the first sample with no infected people.
+"""
+
+import math
+
+import numpy as np
+
+SUSCEPTIBLE, INFECTED, RECOVERED = 0, 1, 2  # same values as sir.Condition
+
+BLOCK = 65_536  # random numbers are drawn in blocks of this size
+
+
+class AggregatedSIR:
+
+    def __init__(self, population, infected, contact_rate, recovery_rate, plot_interval, method='gillespie',
+                 tau=None, rng=None):
+        self.population = population
+        self.contact_rate = contact_rate
+        self.recovery_rate = recovery_rate
+        self.plot_interval = plot_interval
+        self.method = method
+        self.tau = tau if tau is not None else min(plot_interval, 0.1 / max(contact_rate, recovery_rate))
+        self.rng = rng if rng is not None else np.random.default_rng()
+        order = self.rng.permutation(population)
+        self.susceptible = order[infected:]  # the first n_susceptible entries are still susceptible
+        self.n_susceptible = population - infected
+        self.infected = np.empty(population, dtype=order.dtype)  # the first n_infected entries are infected
+        self.infected[:infected] = order[:infected]
+        self.n_infected = infected
+        self.n_recovered = 0
+        self.conditions = np.zeros(population, dtype=np.int8)
+        self.conditions[order[:infected]] = INFECTED
+        self.t = 0.0
+        self.s, self.i, self.r = [], [], []
+
+    def run(self):
+        if self.method == 'gillespie':
+            self._run_gillespie()
+        elif self.method == 'tau-leap':
+            self._run_tau_leap()
+        else:
+            raise ValueError(f"unknown method {self.method!r}")
+
+    def _sample(self):
+        self.s.append(self.n_susceptible)
+        self.i.append(self.n_infected)
+        self.r.append(self.n_recovered)
+
+    def _run_gillespie(self):
+        rng, conditions = self.rng, self.conditions
+        susceptible, infected = self.susceptible, self.infected
+        beta = self.contact_rate / self.population
+        gamma = self.recovery_rate
+        S, I, R = self.n_susceptible, self.n_infected, self.n_recovered
+        t, next_sample = 0.0, 0.0
+        waits, uniforms, used = [], [], BLOCK
+        while I > 0:
+            if used == BLOCK:
+                waits, uniforms, used = rng.standard_exponential(BLOCK).tolist(), rng.random(BLOCK).tolist(), 0
+            infection_rate = beta * I * S
+            total = infection_rate + gamma * I
+            t_next = t + waits[used] / total
+            while next_sample <= t_next:  # the state is constant until t_next
+                self.n_susceptible, self.n_infected, self.n_recovered = S, I, R
+                self._sample()
+                next_sample += self.plot_interval
+            u = uniforms[used] * total
+            used += 1
+            if u < infection_rate:
+                S -= 1
+                person = susceptible[S]
+                conditions[person] = INFECTED
+                infected[I] = person
+                I += 1
+            else:  # recovery of a uniformly chosen infected person: (u - infection_rate) / gamma is uniform in [0, I)
+                k = min(int((u - infection_rate) / gamma), I - 1)
+                person = infected[k]
+                conditions[person] = RECOVERED
+                I -= 1
+                infected[k] = infected[I]
+                R += 1
+            t = t_next
+        self.n_susceptible, self.n_infected, self.n_recovered = S, I, R
+        self._sample()  # like MonitorSIR, the last sample is the first one with nobody infected
+        self.t = next_sample
+
+    def _run_tau_leap(self):
+        rng, conditions, tau = self.rng, self.conditions, self.tau
+        beta = self.contact_rate / self.population
+        p_recover = -math.expm1(-self.recovery_rate * tau)
+        t, next_sample = 0.0, 0.0
+        while self.n_infected > 0:
+            while next_sample <= t:
+                self._sample()
+                next_sample += self.plot_interval
+            S, I = self.n_susceptible, self.n_infected
+            new_infections = rng.binomial(S, -math.expm1(-beta * I * tau))
+            recoveries = rng.binomial(I, p_recover)
+            if recoveries:
+                chosen = rng.choice(I, recoveries, replace=False)
+                conditions[self.infected[chosen]] = RECOVERED
+                keep = np.ones(I, dtype=bool)
+                keep[chosen] = False
+                remaining = self.infected[:I][keep]
+                I = len(remaining)
+                self.infected[:I] = remaining
+            if new_infections:
+                people = self.susceptible[S - new_infections:S]
+                conditions[people] = INFECTED
+                self.infected[I:I + new_infections] = people
+                I += new_infections
+                S -= new_infections
+            self.n_susceptible, self.n_infected = S, I
+            self.n_recovered += recoveries
+            t += tau
+        self._sample()  # like MonitorSIR, the last sample is the first one with nobody infected
+        self.t = next_sample
@@ -0,0 +1,66 @@
+"""Plots and data files of SIR runs.
+
+matplotlib is only imported when a figure is actually drawn, so that importing sir (or running it headless, for
+batches of short runs) does not pay for it. Figures written to files are drawn on a matplotlib.figure.Figure without
+going through pyplot, so no GUI backend is ever loaded and they work on machines without a display.
+
+    report(t, s, i, r)                 # show the plot in a window, as sir.py always did
+    report(t, s, i, r, 'run.png')      # .png, .svg or .pdf: write the figure
+    report(t, s, i, r, 'run.csv')      # .csv or .npz: write the time series itself
+"""
+
+import csv
+import os
+
+FIGURE_FORMATS = ('.png', '.svg', '.pdf')
+DATA_FORMATS = ('.csv', '.npz')
+
+
+def _draw(ax, t, s, i, r):
+    ax.plot(t, s, label="Susceptible")
+    ax.plot(t, i, label="Infected")
+    ax.plot(t, r, label="Recovered")
+    ax.set_xlabel("Days")
+    ax.set_ylabel("Individuals")
+    ax.legend(loc=0)
+    ax.grid()
+
+
+def show(t, s, i, r):
+    from matplotlib import pyplot as plt
+
+    _draw(plt.gca(), t, s, i, r)
+    plt.show()
+
+
+def save_figure(path, t, s, i, r):
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    _draw(figure.subplots(), t, s, i, r)
+    figure.savefig(path)
+
+
+def save_data(path, t, s, i, r):
+    if path.endswith('.npz'):
+        import numpy as np
+        np.savez(path, t=t, susceptible=s, infected=i, recovered=r)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['t', 'susceptible', 'infected', 'recovered'])
+        writer.writerows(zip(t, s, i, r))
+
+
+def report(t, s, i, r, path=None):
+    """Show the plot if path is None, otherwise write the figure or the data, depending on the file extension."""
+    if path is None:
+        show(t, s, i, r)
+        return
+    extension = os.path.splitext(path)[1].lower()
+    if extension in FIGURE_FORMATS:
+        save_figure(path, t, s, i, r)
+    elif extension in DATA_FORMATS:
+        save_data(path, t, s, i, r)
+    else:
+        raise ValueError(f"unknown output format {extension!r}: use one of {FIGURE_FORMATS + DATA_FORMATS}")
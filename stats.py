@@ -0,0 +1,206 @@
+"""Online statistics in O(1) memory, updated as the simulation runs.
+
+RunningStats  -- count, mean, variance, min and max of a stream of values (Welford's algorithm).
+P2Quantile    -- estimate of a quantile of a stream with five markers (the P-square algorithm, Jain & Chlamtac 1985).
+TimeAverage   -- time-weighted average of a piecewise constant quantity, such as a queue length.
+QueueStats    -- the collector used by the MMN models: sojourn times, number of jobs in the system, server usage.
+
+t_quantile() and confidence_interval() turn independent estimates (replications, batch means) into intervals.
+"""
+
+import math
+import statistics
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of the values passed to add()."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the current mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @property
+    def variance(self):
+        """Sample variance (0 with fewer than two values)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+
+class P2Quantile:
+    """Streaming estimate of the p-quantile of the values passed to add(), using five markers.
+
+    The first five values are stored as they are; after that, marker heights are adjusted with a piecewise parabolic
+    prediction so that the middle marker tracks the p-quantile.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        heights, positions = self.heights, self.positions
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+        # find the cell k such that heights[k] <= x < heights[k + 1], extending the extreme markers if needed
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        # adjust the three middle markers if they are off their desired position
+        for i in (1, 2, 3):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                heights[i] = height
+                positions[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self):
+        if len(self.heights) < 5:  # not enough data for the markers: use the exact quantile of what we have
+            if not self.heights:
+                return math.nan
+            return self.heights[min(len(self.heights) - 1, int(self.p * len(self.heights)))]
+        return self.heights[2]
+
+
+class TimeAverage:
+    """Time-weighted average of a quantity that changes at discrete times."""
+
+    def __init__(self, t=0.0, value=0):
+        self.start = t
+        self.last_t = t
+        self.value = value
+        self.area = 0.0
+
+    def update(self, t, value):
+        """The quantity becomes `value` at time t."""
+        self.area += self.value * (t - self.last_t)
+        self.last_t = t
+        self.value = value
+
+    def mean(self, t):
+        """The average between the start and time t (t must not precede the last update)."""
+        elapsed = t - self.start
+        if elapsed <= 0:
+            return float(self.value)
+        return (self.area + self.value * (t - self.last_t)) / elapsed
+
+
+class QueueStats:
+    """Statistics of a queueing simulation with n servers.
+
+    The model calls job_arrived() and job_completed() for every job, and server_busy() / server_idle() whenever a
+    server changes state; everything else is derived from these calls in constant time and memory.
+    """
+
+    def __init__(self, n, quantiles=(0.5, 0.9, 0.99)):
+        self.sojourn = RunningStats()
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+        self.in_system = 0  # number of jobs in the system (waiting or running)
+        self.jobs = TimeAverage()  # time-average of in_system
+        self.busy_since = [None] * n  # for each server, the time it became busy (None if idle)
+        self.busy_time = [0.0] * n
+        self.on_sojourn = None  # if not None, called with every sojourn time (e.g. a steady_state.SteadyState)
+
+    def job_arrived(self, t):
+        self.in_system += 1
+        self.jobs.update(t, self.in_system)
+
+    def job_completed(self, t, arrival_time):
+        self.in_system -= 1
+        self.jobs.update(t, self.in_system)
+        sojourn = t - arrival_time
+        self.sojourn.add(sojourn)
+        for quantile in self.quantiles.values():
+            quantile.add(sojourn)
+        if self.on_sojourn is not None:
+            self.on_sojourn(sojourn)
+
+    def server_busy(self, server, t):
+        self.busy_since[server] = t
+
+    def server_idle(self, server, t):
+        self.busy_time[server] += t - self.busy_since[server]
+        self.busy_since[server] = None
+
+    def utilisation(self, t):
+        """Fraction of the time between 0 and t each server spent busy."""
+        return [(busy + (t - since if since is not None else 0)) / t if t > 0 else 0.0
+                for busy, since in zip(self.busy_time, self.busy_since)]
+
+    def summary(self, t):
+        """A dictionary of the main results at time t."""
+        utilisation = self.utilisation(t)
+        return {
+            'completed': self.sojourn.count,
+            'W': self.sojourn.mean,
+            'W_stdev': self.sojourn.stdev,
+            **{f'W_p{round(p * 100):d}': quantile.value for p, quantile in self.quantiles.items()},
+            'L': self.jobs.mean(t),
+            'utilisation': sum(utilisation) / len(utilisation),
+        }
+
+
+def t_quantile(p, df):
+    """Quantile p of the Student t distribution with df degrees of freedom.
+
+    Exact for df 1 and 2, otherwise the Cornish-Fisher expansion around the normal quantile (relative error below
+    0.2% for df >= 3 at the usual confidence levels).
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) * math.sqrt(2 / (4 * p * (1 - p)))
+    z = statistics.NormalDist().inv_cdf(p)
+    return (z + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4))
+
+
+def confidence_interval(values, confidence=0.95):
+    """Mean and half-width of the confidence interval of the mean of independent values."""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, math.inf
+    return mean, t_quantile((1 + confidence) / 2, len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values))
@@ -0,0 +1,95 @@
+"""Steady-state run control: warm-up truncation with MSER-5 and early stopping with batch means.
+
+A SteadyState object receives the output observations of a run (e.g. sojourn times, through
+QueueStats.on_sojourn) and is also the `stop` callback of Simulation.run():
+
+    control = SteadyState(precision=0.01)
+    sim.stats.on_sojourn = control.add
+    sim.run(max_t, stop=control)
+    print(control.mean, control.half_width, control.truncated)
+
+Observations are averaged in groups of 5 (MSER-5). To keep memory bounded, when more than max_points groups have
+been collected adjacent groups are merged, doubling the group size. At every check the warm-up is chosen by MSER
+over the groups (the truncation point d minimising the variance of the mean of what is left, searched in the first
+half of the run), the remaining groups are split into `batches` batch means, and the run stops when the confidence
+interval half-width of their mean is within `precision` of the mean.
+"""
+
+import math
+import statistics
+
+from stats import t_quantile
+
+
+def mser(values):
+    """The MSER truncation point of a sequence: the d (at most len(values) // 2) minimising
+    sum((values[d:] - mean(values[d:])) ** 2) / (len(values) - d) ** 2."""
+    n = len(values)
+    best, best_d = math.inf, 0
+    total = total_sq = 0.0
+    suffix = []  # (sum, sum of squares) of values[d:], for d from n - 1 down to 0
+    for x in reversed(values):
+        total += x
+        total_sq += x * x
+        suffix.append((total, total_sq))
+    for d in range(n // 2 + 1):
+        total, total_sq = suffix[n - 1 - d]
+        remaining = n - d
+        score = (total_sq - total * total / remaining) / (remaining * remaining)
+        if score < best:
+            best, best_d = score, d
+    return best_d
+
+
+class SteadyState:
+
+    def __init__(self, precision, confidence=0.95, batches=20, group=5, max_points=2_000):
+        self.precision = precision  # target relative half-width of the confidence interval
+        self.confidence = confidence
+        self.batches = batches
+        self.group = group  # observations per point; doubles when points are merged
+        self.max_points = max_points
+        self.points = []  # means of `group` consecutive observations
+        self.partial_sum = 0.0
+        self.partial_count = 0
+        self.count = 0  # observations received
+        self.truncated = 0  # observations discarded as warm-up at the last check
+        self.mean = math.nan
+        self.half_width = math.inf
+
+    def add(self, x):
+        self.count += 1
+        self.partial_sum += x
+        self.partial_count += 1
+        if self.partial_count == self.group:
+            self.points.append(self.partial_sum / self.group)
+            self.partial_sum, self.partial_count = 0.0, 0
+            if len(self.points) > self.max_points:
+                self._merge()
+
+    def _merge(self):
+        points = self.points
+        if len(points) % 2:  # fold the odd point back into the partial group
+            last = points.pop()
+            self.partial_sum += last * self.group
+            self.partial_count += self.group
+        self.points = [(a + b) / 2 for a, b in zip(points[::2], points[1::2])]
+        self.group *= 2
+
+    def converged(self):
+        """Update mean, half_width and truncated from the observations so far; True if the precision is reached."""
+        d = mser(self.points)
+        self.truncated = d * self.group
+        steady = self.points[d:]
+        per_batch = len(steady) // self.batches
+        if per_batch < 5:  # too few observations for the batch means to be approximately independent and normal
+            return False
+        steady = steady[len(steady) - per_batch * self.batches:]  # drop the oldest points that don't fill a batch
+        means = [statistics.fmean(steady[i:i + per_batch]) for i in range(0, len(steady), per_batch)]
+        self.mean = statistics.fmean(means)
+        self.half_width = (t_quantile((1 + self.confidence) / 2, self.batches - 1) * statistics.stdev(means)
+                           / math.sqrt(self.batches))
+        return self.half_width <= self.precision * abs(self.mean)
+
+    def __call__(self, sim):
+        return self.converged()
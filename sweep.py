@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""Parameter sweeps: every point of a grid, with independent replications, on a pool of worker processes.
+
+Results are written in batches to a columnar store (a directory of NumPy .npz files, one column per parameter or
+metric) that can be exported to CSV. Every row is identified by a key built from the model, the parameters and the
+seed; points already present in the store are skipped, so re-running an interrupted sweep only computes what is
+missing. With --cache, runs found in a result_cache.ResultCache are copied instead of simulated (and new ones are
+added to it), and with --analytical, points with an exact formula (see analytical.py) get one row computed from it
+instead of replications. The 'source' column tells the three kinds of rows apart.
+
+Example:
+
+    python sweep.py mmn_queue2 results/ --grid lambd=0.5,0.7,0.9 --grid n=1,2,4 --reps 5 --csv results.csv
+"""
+
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from analytical import expected
+from replication import MODELS, check_parameters, parse_assignment, replication_seeds, run_replication
+from result_cache import ResultCache, result_key
+
+
+class ResultStore:
+    """Columnar store of results: a directory of batch-NNNNN.npz files with one array per column."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.batches = sorted(name for name in os.listdir(directory) if name.endswith('.npz'))
+        self.rows = []  # rows not written yet
+
+    def keys(self):
+        """The keys of all the rows in the store."""
+        keys = set()
+        for name in self.batches:
+            with np.load(os.path.join(self.directory, name)) as batch:
+                keys.update(batch['key'].tolist())
+        return keys | {row['key'] for row in self.rows}
+
+    def append(self, row):
+        self.rows.append(row)
+
+    def flush(self):
+        """Write the pending rows as a new batch file; columns missing from some rows are filled with NaN."""
+        if not self.rows:
+            return
+        name = f'batch-{len(self.batches):05d}.npz'
+        names = dict.fromkeys(column for row in self.rows for column in row)
+        columns = {column: np.array([row.get(column, np.nan) for row in self.rows]) for column in names}
+        np.savez(os.path.join(self.directory, name), **columns)
+        self.batches.append(name)
+        self.rows = []
+
+    def load(self):
+        """All the stored rows, as a dictionary of column arrays; columns missing from some batches (the metrics an
+        analytical row doesn't have, say) are filled with NaN, or with '' for text columns."""
+        parts = []
+        for name in self.batches:
+            with np.load(os.path.join(self.directory, name)) as batch:
+                parts.append({column: batch[column] for column in batch.files})
+        columns = {}
+        for part in parts:
+            for column, values in part.items():
+                columns.setdefault(column, values.dtype)
+        return {column: np.concatenate([part[column] if column in part else
+                                        np.full(len(part['key']), '' if dtype.kind in 'SU' else np.nan)
+                                        for part in parts])
+                for column, dtype in columns.items()}
+
+    def to_csv(self, path):
+        columns = self.load()
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*(array.tolist() for array in columns.values())))
+
+
+def grid_points(grid):
+    """All the combinations of a {parameter: [values]} grid, as dictionaries."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def _run_task(task):
+    key, model, params, seed = task
+    return key, params, seed, run_replication((model, params, seed))
+
+
+def sweep(model, grid, store, reps=1, seed=0, workers=None, batch_size=100, cache=None, analytical=False):
+    """Run every missing (point, replication) of the grid and write the results to `store`.
+
+    cache is an optional ResultCache consulted before, and filled after, simulating. With analytical=True, points
+    with an exact formula are not simulated: they get a single row, with seed 0 and NaN for the metrics the formula
+    does not give. Returns the number of runs that were computed.
+    """
+    done = store.keys()
+    seeds = replication_seeds(seed, reps)
+    tasks = []
+    try:
+        for point in grid_points(grid):
+            params = {**MODELS[model], **point}
+            theory = expected(model, params) if analytical else None
+            if theory is not None and theory['exact']:
+                key = result_key(model, params, 'analytical')
+                if key not in done:
+                    metrics = {metric: theory[metric] for metric in ('W', 'L', 'utilisation')}
+                    store.append({'key': key, **params, 'seed': 0, **metrics, 'source': 'analytical'})
+                continue
+            for s in seeds:
+                key = result_key(model, params, s)
+                if key in done:
+                    continue
+                result = cache.get(model, params, s) if cache is not None else None
+                if result is not None:
+                    store.append({'key': key, **params, 'seed': s, **result, 'source': 'cache'})
+                else:
+                    tasks.append((key, model, params, s))
+        if tasks:
+            with multiprocessing.Pool(workers) as pool:
+                for key, params, s, result in pool.imap_unordered(_run_task, tasks):
+                    store.append({'key': key, **params, 'seed': s, **result, 'source': 'simulation'})
+                    if cache is not None:
+                        cache.put(model, params, s, result)
+                    if len(store.rows) >= batch_size:
+                        store.flush()
+    finally:  # keep what was computed even if the sweep is interrupted
+        store.flush()
+    return len(tasks)
+
+
+def parse_grid(text):
+    """Parse a --grid name=v1,v2,... option."""
+    name, _, values = text.partition('=')
+    return name, [parse_assignment(f'{name}={value}')[1] for value in values.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('model', choices=MODELS)
+    parser.add_argument('store', help="directory of the result store")
+    parser.add_argument('--grid', action='append', default=[], type=parse_grid, metavar='NAME=V1,V2,...',
+                        help="values of a parameter to sweep over (repeat for each parameter)")
+    parser.add_argument('--reps', type=int, default=1, help="replications per grid point")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--batch-size', type=int, default=100, help="rows per batch file")
+    parser.add_argument('--csv', help="export the whole store to this CSV file at the end")
+    parser.add_argument('--cache', help="SQLite file of previous results, shared with the MMN scripts")
+    parser.add_argument('--analytical', action='store_true',
+                        help="use the exact analytical result for the points that have one, instead of simulating")
+    args = parser.parse_args()
+    check_parameters(parser, args.model, dict(args.grid))
+
+    store = ResultStore(args.store)
+    cache = ResultCache(args.cache) if args.cache is not None else None
+    computed = sweep(args.model, dict(args.grid), store, args.reps, args.seed, args.workers, args.batch_size, cache,
+                     args.analytical)
+    print(f"{computed} runs computed, results in {args.store}")
+    if args.csv is not None:
+        store.to_csv(args.csv)
+
+
+if __name__ == '__main__':
+    main()
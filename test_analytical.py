@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from analytical import erlang_c, erlang_gi_m1, expected, mgc
+from replication import MODELS, run_replication
+
+
+def test_erlang_c():
+    assert erlang_c(1, 0.5) == pytest.approx(0.5)
+    assert erlang_c(2, 1) == pytest.approx(1 / 3)
+    assert erlang_c(2, 2) == 1.0
+
+
+def test_closed_forms():
+    mm1 = mgc(0.5, 1, 1)
+    assert mm1['W'] == pytest.approx(2) and mm1['L'] == pytest.approx(1)
+    assert mgc(0.5, 1, 1, cv2=0)['Wq'] == pytest.approx(0.5)  # M/D/1: rho / (2 mu (1 - rho))
+    assert mgc(1, 1, 2)['W'] == pytest.approx(4 / 3)  # M/M/2 with one busy server on average
+    assert erlang_gi_m1(0.5, 1, 1)['W'] == pytest.approx(mm1['W'])  # E_1/M/1 is M/M/1
+    assert math.isinf(mgc(1, 1, 1)['W'])
+
+
+def test_split_policies_count_all_servers():
+    params = {**MODELS['mmNNN_queue'], 'lambd': 2.0, 'n': 4, 'policy': 'random'}
+    # 4 independent M/M/1 queues with arrival rate 2 / 4 / 4 and service rate 1 / 4: one job each on average
+    assert expected('mmNNN_queue', params)['L'] == pytest.approx(4)
+    assert expected('mmNNN_queue', params)['W'] == pytest.approx(8)
+    assert expected('sir', MODELS['sir']) is None
+
+
+@pytest.mark.parametrize('model, params, tolerance', [
+    ('mmn_queue', {'lambd': 0.5}, 0.1),
+    ('mmn_queue2', {'lambd': 1.0}, 0.1),
+    ('mmn_queue2', {'lambd': 1.0, 'variates': 'numpy', 'service_dist': 'weibull', 'shape': 2}, 0.1),
+    ('mmNNN_queue', {'lambd': 1.0, 'policy': 'random'}, 0.1),
+    ('mmNNN_queue', {'lambd': 1.0, 'policy': 'round-robin'}, 0.1),
+    ('mmNNN_queue', {'lambd': 1.0, 'policy': 'round-robin', 'variates': 'numpy', 'service_dist': 'weibull',
+                     'shape': 2}, 0.15),
+    ('mmNNN_queue', {'lambd': 1.0, 'policy': 'jsq'}, 0.1),
+    ('mmNNN_queue', {'lambd': 4.0, 'n': 10, 'policy': 'power-of-d'}, 0.1),  # mean field: needs a few servers
+])
+def test_formula_matches_simulation(model, params, tolerance):
+    params = {**MODELS[model], 'max_t': 20_000, **params}
+    theory = expected(model, params)
+    result = run_replication((model, params, 1))
+    assert result['W'] == pytest.approx(theory['W'], rel=tolerance)
+    assert result['L'] == pytest.approx(theory['L'], rel=tolerance)
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from discrete_event_sim_V01 import EVENT_QUEUES, BaseEvent, CalendarQueue, Event, EventQueue, Simulation
+
+
+def hold(queue, seed, steps=20_000):
+    """Pop an event and push one or two at the current time or later (the hold model), with few distinct delays so
+    that many events share a time; return the popped (time, id) pairs."""
+    rng = random.Random(seed)
+    popped = []
+    for i in range(10):
+        queue.push((0.0, i), 0.0)
+    next_id = 10
+    while len(popped) < steps:
+        event = queue.pop()
+        popped.append(event)
+        for _ in range(rng.choice((1, 1, 2)) if len(queue) < 100 else 1):
+            t = event[0] + rng.randrange(0, 4) * 0.5
+            queue.push((t, next_id), t)
+            next_id += 1
+    return popped
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_calendar_queue_pops_like_heap_on_ties(seed):
+    popped = hold(EventQueue(), seed)
+    assert hold(CalendarQueue(), seed) == popped
+    assert len(set(t for t, _ in popped)) < len(popped) / 10
+
+
+def test_same_time_events_in_scheduling_order():
+    class Record(BaseEvent):
+        __slots__ = ('name',)
+
+        def __init__(self, name):
+            self.name = name
+
+        def process(self, sim):
+            sim.order.append(self.name)
+
+    orders = []
+    for name in EVENT_QUEUES:
+        sim = Simulation(name)
+        sim.order = []
+        for i in range(200):
+            sim.schedule(i % 3, Record(i))
+        sim.run()
+        orders.append(sim.order)
+    assert orders[0] == orders[1] == sorted(range(200), key=lambda i: i % 3)
+
+
+def test_callback_event():
+    calls = []
+    sim = Simulation()
+    sim.schedule(5, Event('x', 5, lambda: calls.append(sim.t)))
+    sim.run()
+    assert calls == [5]
+
+
+def test_calendar_day_length_ignores_ties():
+    entries = [(t, i, None) for i, t in enumerate([0.0] * 20 + [1.0, 2.0, 3.0, 4.0, 5.0])]
+    assert CalendarQueue._estimate_width(entries) == pytest.approx(CalendarQueue.DAY_EVENTS)
+
+
+
+class Nothing(BaseEvent):
+    __slots__ = ()
+
+    def process(self, sim):
+        pass
+
+
+class Pending(Simulation):
+    def pending(self):
+        return (len(self.event_queue),)
+
+
+def test_daemons_dont_keep_the_run_going(tmp_path):
+    from checkpoint import Checkpoint, load_snapshot
+    from monitor import Monitor, TimeSeries
+
+    path = str(tmp_path / 'snapshot')
+    sim = Pending()
+    sim.schedule(62.5, Nothing())
+    sim.schedule_daemon(20, Checkpoint(20, path))
+    sim.run()
+    assert sim.t == 62.5  # not 80, the time of the next checkpoint
+    restored = load_snapshot(path)
+    assert restored.t == 60 and restored.daemons == 1
+
+    sim = Pending()
+    sim.schedule(62.5, Nothing())
+    series = TimeSeries(('pending',))
+    sim.schedule(0, Monitor(series, sim.pending, interval=10))
+    sim.schedule_daemon(20, Checkpoint(20, path))
+    sim.run()  # the monitor and the checkpoint used to keep each other going for ever
+    assert list(series.times) == [0, 10, 20, 30, 40, 50, 60, 70] and sim.t == 70
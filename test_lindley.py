@@ -0,0 +1,30 @@
+import argparse
+
+import pytest
+
+from lindley import add_engine_arguments, check_engine_arguments, cross_check
+
+
+@pytest.mark.parametrize('n', [1, 4])
+def test_same_sojourn_times_as_event_simulation(n):
+    assert cross_check(n, 20_000) < 1e-9
+
+
+def parse(options, max_n=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=1)
+    parser.add_argument('--precision', type=float)
+    add_engine_arguments(parser)
+    args = parser.parse_args(options)
+    check_engine_arguments(parser, args, max_n)
+    return args
+
+
+def test_engine_arguments():
+    assert parse(['--engine', 'lindley', '--n', '4']).n == 4
+    with pytest.raises(SystemExit):
+        parse(['--engine', 'lindley', '--precision', '0.01'])
+    with pytest.raises(SystemExit):
+        parse(['--engine', 'lindley', '--n', '2'], max_n=1)
+    with pytest.raises(SystemExit):
+        parse(['--n', '2'], max_n=1)
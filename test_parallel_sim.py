@@ -0,0 +1,9 @@
+import pytest
+
+from parallel_sim import INDEPENDENT_POLICIES, check
+
+
+@pytest.mark.parametrize('trace', [True, False])
+@pytest.mark.parametrize('policy', INDEPENDENT_POLICIES)
+def test_same_completion_times_as_mmNNN_queue(policy, trace):
+    assert check(10, 5_000, 8, policy, workers=(1, 2), trace=trace) == (0, True)
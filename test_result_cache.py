@@ -0,0 +1,19 @@
+from result_cache import ResultCache, result_key
+
+
+def test_key_ignores_number_types_order_and_default_variates():
+    key = result_key('mmn_queue2', {'lambd': 0.7, 'mu': 1, 'n': 2, 'max_t': 100_000}, 5)
+    assert result_key('mmn_queue2', {'max_t': 100_000.0, 'n': 2.0, 'mu': 1.0, 'lambd': 0.7}, 5) == key
+    assert result_key('mmn_queue2', {'lambd': 0.7, 'mu': 1, 'n': 2, 'max_t': 100_000, 'variates': 'python'}, 5) == key
+    assert result_key('mmn_queue2', {'lambd': 0.7, 'mu': 1, 'n': 2, 'max_t': 100_000, 'variates': 'numpy'}, 5) != key
+    assert result_key('mmn_queue2', {'lambd': 0.7, 'mu': 1, 'n': 2, 'max_t': 100_000}, 6) != key
+
+
+def test_put_get(tmp_path):
+    cache = ResultCache(tmp_path / 'results.sqlite')
+    seed = 2 ** 64 - 1  # as spawned by replication_seeds
+    assert cache.get('mmn_queue', {'lambd': 0.5}, seed) is None
+    cache.put('mmn_queue', {'lambd': 0.5}, seed, {'W': 2.0})
+    assert cache.get('mmn_queue', {'lambd': 0.5}, seed) == {'W': 2.0}
+    assert len(cache) == 1
+    cache.close()
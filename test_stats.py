@@ -0,0 +1,53 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from stats import P2Quantile, RunningStats, TimeAverage, confidence_interval, t_quantile
+
+
+@pytest.mark.parametrize('p', [0.5, 0.9, 0.99])
+@pytest.mark.parametrize('distribution', ['exponential', 'uniform'])
+def test_p2_quantile_close_to_exact(p, distribution):
+    rng = random.Random(1)
+    draw = (lambda: rng.expovariate(1)) if distribution == 'exponential' else rng.random
+    values = [draw() for _ in range(100_000)]
+    estimate = P2Quantile(p)
+    for x in values:
+        estimate.add(x)
+    exact = statistics.quantiles(values, n=100, method='inclusive')[round(p * 100) - 1]
+    assert estimate.value == pytest.approx(exact, rel=0.02)
+
+
+def test_p2_quantile_exact_on_few_values():
+    estimate = P2Quantile(0.5)
+    assert math.isnan(estimate.value)
+    for x in (3, 1, 2):
+        estimate.add(x)
+    assert estimate.value == 2
+
+
+def test_running_stats():
+    rng = random.Random(2)
+    values = [rng.gauss(0, 1) for _ in range(1000)]
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    assert stats.mean == pytest.approx(statistics.fmean(values))
+    assert stats.variance == pytest.approx(statistics.variance(values))
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+
+def test_time_average():
+    average = TimeAverage()
+    average.update(1, 2)
+    average.update(3, 0)
+    assert average.mean(4) == pytest.approx(1)
+
+
+def test_confidence_interval():
+    assert t_quantile(0.975, 1) == pytest.approx(12.706, rel=1e-3)
+    assert t_quantile(0.975, 10) == pytest.approx(2.228, rel=2e-3)
+    mean, half_width = confidence_interval([1, 2, 3])
+    assert mean == 2 and half_width == pytest.approx(4.303 / math.sqrt(3), rel=1e-3)
@@ -0,0 +1,19 @@
+import csv
+import math
+
+from sweep import ResultStore, sweep
+
+
+def test_analytical_and_simulated_batches(tmp_path):
+    store = ResultStore(tmp_path / 'store')
+    grid = {'policy': ['random'], 'max_t': [500.0]}
+    assert sweep('mmNNN_queue', grid, store, workers=1, analytical=True) == 0
+    assert sweep('mmNNN_queue', {**grid, 'policy': ['random', 'jsq']}, store, workers=1) == 2
+    store.to_csv(tmp_path / 'results.csv')
+    with open(tmp_path / 'results.csv') as f:
+        rows = list(csv.DictReader(f))
+
+    assert [row['source'] for row in rows] == ['analytical', 'simulation', 'simulation']
+    assert {'completed', 'W_stdev', 'W_p50', 'W_p90', 'W_p99'} <= set(rows[0])
+    assert math.isnan(float(rows[0]['W_p99']))
+    assert all(float(row['W_p99']) > 0 for row in rows[1:])
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Offline analysis of the job traces written by job_trace.JobTraceWriter, without re-running the simulation.
+
+The column files are memory-mapped and processed in chunks of `chunk_size` jobs with vectorized NumPy operations, so
+traces much larger than memory can be analysed, and a trace can be analysed while its run is still writing it:
+
+    trace = load_trace('trace/')
+    results = analyse(trace)
+    results['W'], results['sojourn_percentiles'], results['utilisation']
+
+    python trace_analysis.py trace/ --cdf cdf.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def load_trace(directory):
+    """The columns of a trace as read-only memory-mapped arrays, cut to the number of complete records."""
+    with open(os.path.join(directory, 'columns.json')) as f:
+        dtypes = json.load(f)['columns']
+    paths = {name: os.path.join(directory, name + '.bin') for name in dtypes}
+    jobs = min(os.path.getsize(path) // np.dtype(dtypes[name]).itemsize for name, path in paths.items())
+    if jobs == 0:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in dtypes.items()}
+    return {name: np.memmap(path, dtype=dtypes[name], mode='r', shape=(jobs,)) for name, path in paths.items()}
+
+
+def chunks(trace, chunk_size):
+    """Dictionaries of consecutive slices of the columns, of at most chunk_size jobs each."""
+    jobs = len(trace['job'])
+    for start in range(0, jobs, chunk_size):
+        yield {name: column[start:start + chunk_size] for name, column in trace.items()}
+
+
+class Distribution:
+    """Count, sum and histogram of non-negative values, accumulated chunk by chunk over [0, maximum]."""
+
+    def __init__(self, maximum, bins):
+        self.edges = np.linspace(0, maximum if maximum > 0 else 1, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, values):
+        self.counts += np.histogram(values, self.edges)[0]
+        self.count += len(values)
+        self.total += float(values.sum())
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def cdf(self):
+        """(x, F(x)) at the bin edges."""
+        return self.edges, np.concatenate([[0.0], np.cumsum(self.counts) / max(self.count, 1)])
+
+    def percentiles(self, ps=PERCENTILES):
+        """Percentiles interpolated in the histogram, accurate to a bin width."""
+        x, cdf = self.cdf()
+        return {p: float(np.interp(p / 100, cdf, x)) for p in ps}
+
+
+def analyse(trace, n=None, bins=10_000, chunk_size=1 << 22):
+    """Sojourn, waiting and service time distributions and per-server utilisation of a trace.
+
+    n is the number of servers (by default the largest server index seen, plus one). Utilisation is the service time
+    of the completed jobs over the time of the last completion, so jobs still in service at the end are not counted.
+    """
+    jobs = len(trace['job'])
+    if jobs == 0:
+        raise ValueError("the trace holds no jobs")
+    # first pass: ranges of the values, to fix the histogram bins
+    max_sojourn = max_waiting = max_service = horizon = 0.0
+    max_server = 0
+    for chunk in chunks(trace, chunk_size):
+        arrival, start, completion = chunk['arrival'], chunk['start'], chunk['completion']
+        max_sojourn = max(max_sojourn, float((completion - arrival).max()))
+        max_waiting = max(max_waiting, float((start - arrival).max()))
+        max_service = max(max_service, float((completion - start).max()))
+        horizon = max(horizon, float(completion.max()))
+        max_server = max(max_server, int(chunk['server'].max()))
+    n = n if n is not None else max_server + 1
+    sojourn, waiting, service = (Distribution(max_sojourn, bins), Distribution(max_waiting, bins),
+                                 Distribution(max_service, bins))
+    busy = np.zeros(n)
+    waited = 0
+    for chunk in chunks(trace, chunk_size):
+        arrival, start, completion = chunk['arrival'], chunk['start'], chunk['completion']
+        sojourn.add(completion - arrival)
+        wait = start - arrival
+        waiting.add(wait)
+        waited += int(np.count_nonzero(wait > 0))
+        service_time = completion - start
+        service.add(service_time)
+        busy += np.bincount(chunk['server'], weights=service_time, minlength=n)
+    utilisation = busy / horizon
+    return {
+        'jobs': jobs,
+        'horizon': horizon,
+        'W': sojourn.mean,
+        'waiting': waiting.mean,
+        'service': service.mean,
+        'waited_fraction': waited / jobs,
+        'sojourn_percentiles': sojourn.percentiles(),
+        'waiting_percentiles': waiting.percentiles(),
+        'sojourn_cdf': sojourn.cdf(),
+        'waiting_cdf': waiting.cdf(),
+        'utilisation': utilisation,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', help="trace directory written with --job-trace")
+    parser.add_argument('--n', type=int, help="number of servers (default: from the trace)")
+    parser.add_argument('--bins', type=int, default=10_000, help="histogram bins of the distributions")
+    parser.add_argument('--cdf', help="CSV file in which to write the sojourn and waiting time CDFs")
+    args = parser.parse_args()
+
+    results = analyse(load_trace(args.directory), args.n, args.bins)
+    print(f"{results['jobs']} jobs completed by time {results['horizon']:.1f}")
+    print(f"Average time in the system: {results['W']:.4f} (waiting {results['waiting']:.4f}, "
+          f"service {results['service']:.4f}); {results['waited_fraction']:.1%} of the jobs waited")
+    for name in ('sojourn', 'waiting'):
+        percentiles = ', '.join(f"{p}% {value:.3f}" for p, value in results[name + '_percentiles'].items())
+        print(f"{name.capitalize()} time percentiles: {percentiles}")
+    utilisation = results['utilisation']
+    print(f"Server utilisation: mean {utilisation.mean():.3f}, min {utilisation.min():.3f}, "
+          f"max {utilisation.max():.3f}")
+    if args.cdf is not None:
+        with open(args.cdf, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'x', 'F'])
+            for name in ('sojourn', 'waiting'):
+                writer.writerows((name, x, cdf) for x, cdf in zip(*results[name + '_cdf']))
+
+
+if __name__ == '__main__':
+    main()
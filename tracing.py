@@ -0,0 +1,133 @@
+"""Structured event tracing for Simulation.
+
+Tracing is off unless a tracer is attached to the simulation (sim.tracer = ...). Every trace point in the models is
+guarded by `if sim.tracer is not None:`, so when tracing is disabled no message is formatted and no logger is looked
+up. A tracer receives records (time, kind, ids...) and buffers them before writing them to a file:
+
+- JsonlTracer writes one JSON object per line: {"t": 1.5, "kind": "contact", "ids": [3, 17]}
+- BinaryTracer writes fixed-size little-endian records (time: float64, kind code: uint16, two int64 ids, -1 when
+  missing) and, on close, the table of kind names in a <path>.kinds.json side file. read_binary_trace() reads it back.
+- LoggingTracer sends human-readable lines to the logging module, like the old per-event console output.
+"""
+
+import json
+import logging
+import struct
+
+BINARY_RECORD = struct.Struct('<dHqq')
+
+
+class JsonlTracer:
+    """Buffered JSON-lines trace writer."""
+
+    def __init__(self, path, buffer_size=10_000):
+        self.file = open(path, 'w')
+        self.buffer = []
+        self.buffer_size = buffer_size
+
+    def record(self, t, kind, *ids):
+        self.buffer.append(json.dumps({'t': t, 'kind': kind, 'ids': ids}))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BinaryTracer(JsonlTracer):
+    """Buffered writer of fixed-size binary trace records (see the module docstring for the layout)."""
+
+    def __init__(self, path, buffer_size=10_000):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size * BINARY_RECORD.size
+        self.kinds = {}  # kind name -> code
+
+    def record(self, t, kind, first=-1, second=-1):
+        code = self.kinds.get(kind)
+        if code is None:
+            code = self.kinds[kind] = len(self.kinds)
+        self.buffer += BINARY_RECORD.pack(t, code, first, second)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        with open(self.path + '.kinds.json', 'w') as f:
+            json.dump(sorted(self.kinds, key=self.kinds.get), f)
+
+
+def read_binary_trace(path):
+    """Yield the (t, kind, first_id, second_id) records written by a BinaryTracer."""
+
+    with open(path + '.kinds.json') as f:
+        kinds = json.load(f)
+    with open(path, 'rb') as f:
+        while chunk := f.read(BINARY_RECORD.size * 10_000):
+            for t, code, first, second in BINARY_RECORD.iter_unpack(chunk):
+                yield t, kinds[code], first, second
+
+
+class LoggingTracer:
+    """Write trace records as INFO log lines; this is what --verbose uses."""
+
+    MESSAGES = {
+        'arrival': '{0} arrives at server {1}',
+        'completion': '{0} completed at server {1}',
+        'contact': '{0} contacts {1}',
+        'infect': '{0} infected',
+        'recover': '{0} recovered',
+    }
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger()
+
+    def record(self, t, kind, *ids):
+        template = self.MESSAGES.get(kind)
+        message = template.format(*ids) if template else ' '.join([kind, *map(str, ids)])
+        self.logger.info(f'{t:.2f}: {message}')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+TRACERS = {'jsonl': JsonlTracer, 'binary': BinaryTracer}
+
+
+def add_trace_arguments(parser):
+    """Add the --trace / --trace-format options shared by the command line scripts."""
+
+    parser.add_argument('--trace', help="file in which to write a structured trace of the simulation events")
+    parser.add_argument('--trace-format', choices=TRACERS, default='jsonl')
+
+
+def tracer_from_args(args):
+    """The tracer requested on the command line, or None."""
+
+    if args.trace is not None:
+        return TRACERS[args.trace_format](args.trace)
+    if getattr(args, 'verbose', False):
+        return LoggingTracer()
+    return None
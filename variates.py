@@ -0,0 +1,165 @@
+"""Random variates generated in NumPy blocks and handed out one at a time.
+
+Calling random.expovariate() once per event is a significant part of the cost of a simulation step. A sampler here
+draws BLOCK_SIZE values at once with a NumPy generator and returns them one by one when called, so the per-event
+cost is a list pop. Samplers are plain picklable objects (so they can be checkpointed with the simulation), and all
+the samplers made by one VariateStream share its generator: seeding the stream makes the whole run reproducible.
+
+    stream = VariateStream(seed=42)
+    service = stream.weibull(shape=0.5, mean=2)  # heavy-tailed service times with mean 2
+    service()  # -> one sample
+"""
+
+import math
+import random
+
+import numpy as np
+
+BLOCK_SIZE = 8192
+
+
+class BlockSampler:
+    """Base class: subclasses define _block(size), returning a NumPy array of `size` samples."""
+
+    def __init__(self, rng, block_size=BLOCK_SIZE):
+        self.rng = rng
+        self.block_size = block_size
+        self.values = []
+
+    def __call__(self):
+        try:
+            return self.values.pop()
+        except IndexError:
+            self.values = self._block(self.block_size).tolist()
+            return self.values.pop()
+
+    def sample(self, size):
+        """`size` samples at once, as a NumPy array (for vectorized engines such as lindley)."""
+        return self._block(size)
+
+    def reseed(self, rng):
+        """Draw from rng from now on, dropping the samples already drawn (see checkpoint.reseed)."""
+        self.rng = rng
+        self.values = []
+
+    def _block(self, size):
+        raise NotImplementedError
+
+
+class Exponential(BlockSampler):
+
+    def __init__(self, rng, rate, block_size=BLOCK_SIZE):
+        super().__init__(rng, block_size)
+        self.rate = rate
+
+    def _block(self, size):
+        return self.rng.standard_exponential(size) / self.rate
+
+
+class Weibull(BlockSampler):
+    """Weibull variates with the given shape, scaled to have the given mean."""
+
+    def __init__(self, rng, shape, mean, block_size=BLOCK_SIZE):
+        super().__init__(rng, block_size)
+        self.shape = shape
+        self.scale = mean / math.gamma(1 + 1 / shape)
+
+    def _block(self, size):
+        return self.rng.weibull(self.shape, size) * self.scale
+
+
+class Pareto(BlockSampler):
+    """Pareto (type I) variates with tail index `shape` > 1, scaled to have the given mean."""
+
+    def __init__(self, rng, shape, mean, block_size=BLOCK_SIZE):
+        if shape <= 1:
+            raise ValueError("the mean of a Pareto distribution is finite only for shape > 1")
+        super().__init__(rng, block_size)
+        self.shape = shape
+        self.minimum = mean * (shape - 1) / shape
+
+    def _block(self, size):
+        return (self.rng.pareto(self.shape, size) + 1) * self.minimum
+
+
+class Empirical(BlockSampler):
+    """Values resampled uniformly, with replacement, from observed samples."""
+
+    def __init__(self, rng, samples, block_size=BLOCK_SIZE):
+        super().__init__(rng, block_size)
+        self.samples = np.asarray(samples, dtype=float)
+
+    def _block(self, size):
+        return self.rng.choice(self.samples, size)
+
+
+class Integers(BlockSampler):
+    """Integers uniformly distributed in range(n)."""
+
+    def __init__(self, rng, n, block_size=BLOCK_SIZE):
+        super().__init__(rng, block_size)
+        self.n = n
+
+    def _block(self, size):
+        return self.rng.integers(self.n, size=size)
+
+
+class VariateStream:
+    """A seeded NumPy generator and a factory of samplers drawing from it."""
+
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+
+    def exponential(self, rate):
+        return Exponential(self.rng, rate, self.block_size)
+
+    def weibull(self, shape, mean):
+        return Weibull(self.rng, shape, mean, self.block_size)
+
+    def pareto(self, shape, mean):
+        return Pareto(self.rng, shape, mean, self.block_size)
+
+    def empirical(self, samples):
+        return Empirical(self.rng, samples, self.block_size)
+
+    def integers(self, n):
+        return Integers(self.rng, n, self.block_size)
+
+    def distribution(self, name, mean, shape=None):
+        """A sampler of the named distribution ('exp', 'weibull' or 'pareto') with the given mean."""
+        if name == 'exp':
+            return self.exponential(1 / mean)
+        if name == 'weibull':
+            return self.weibull(shape, mean)
+        if name == 'pareto':
+            return self.pareto(shape, mean)
+        raise ValueError(f"unknown distribution {name!r}")
+
+
+def weibull_generator(shape, mean, seed=None):
+    """A callable returning Weibull variates with the given shape and mean."""
+    return VariateStream(seed).weibull(shape, mean)
+
+
+DISTRIBUTIONS = ['exp', 'weibull', 'pareto']
+
+
+def add_variate_arguments(parser):
+    """Add the options choosing how the MMN scripts generate interarrival and service times."""
+    parser.add_argument('--variates', choices=['python', 'numpy'], default='python',
+                        help="random.expovariate per event, or NumPy blocks (implied by non-exponential service)")
+    parser.add_argument('--service-dist', choices=DISTRIBUTIONS, default='exp', help="service time distribution")
+    parser.add_argument('--shape', type=float, default=2, help="shape of the Weibull or Pareto service times")
+    parser.add_argument('--seed', type=int, help="seed of the random module and of the NumPy variate stream")
+
+
+def variates_from_args(args, arrival_rate, service_rate):
+    """The (interarrival, service) samplers requested on the command line; (None, None) means the models' default
+    random.expovariate calls."""
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.variates == 'python' and args.service_dist == 'exp':
+        return None, None
+    stream = VariateStream(args.seed)
+    return stream.exponential(arrival_rate), stream.distribution(args.service_dist, 1 / service_rate, args.shape)
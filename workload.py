@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""Workloads: replay recorded interarrival and service times in the MMN models, or generate them in a fixed order.
+
+A trace is a sequence of jobs, each with an interarrival time (or an arrival timestamp, with timestamps=True) and a
+service time, stored as
+
+- CSV, optionally gzip-compressed (.csv, .csv.gz): the first two columns of every line; a header line is skipped;
+- NumPy .npy files holding an (n, 2) array of floats;
+- raw binary (.bin): little-endian float64 pairs, as written by `python workload.py convert`.
+
+TraceWorkload reads the trace in blocks of `block_size` jobs in a background thread, which keeps at most
+`read_ahead` blocks ready, so traces of any size are streamed with bounded memory while parsing and decompression
+overlap with the simulation. The models ask for the next interarrival time when they schedule an arrival, and for the
+service time of a given job when it starts service, so jobs keep their own service time whatever the order in which
+servers pick them up:
+
+    sim = mmn_queue2.MMN(lambd, mu, n, workload=TraceWorkload('requests.csv.gz', timestamps=True))
+    sim.run()  # runs until the trace is over and the last job has left
+
+    python workload.py convert requests.csv.gz requests.bin --timestamps   # for faster replays
+
+GeneratedWorkload has the same interface but draws the jobs from variates samplers, a block of interarrival times then
+a block of service times, so the jobs depend only on the samplers and not on the order of the model's events: the
+parallel kernel (parallel_sim) generates exactly the jobs of the sequential mmNNN_queue.
+"""
+
+import argparse
+import gzip
+import itertools
+import queue
+import threading
+
+import numpy as np
+
+from variates import BLOCK_SIZE
+
+
+def _open_text(path):
+    return gzip.open(path, 'rt') if path.endswith('.gz') else open(path)
+
+
+def _is_header(line):
+    try:
+        float(line.replace(',', ' ').split()[0])
+        return False
+    except (ValueError, IndexError):
+        return True
+
+
+def read_blocks(path, block_size):
+    """(n, 2) float arrays of consecutive records of the trace in path, of at most block_size rows each."""
+    if path.endswith('.npy') or path.endswith('.bin'):
+        if path.endswith('.npy'):
+            records = np.load(path, mmap_mode='r')
+        else:
+            records = np.memmap(path, dtype='<f8', mode='r')
+            records = records[:len(records) // 2 * 2].reshape(-1, 2)
+        for start in range(0, len(records), block_size):
+            yield np.array(records[start:start + block_size, :2], dtype=float)
+        return
+    with _open_text(path) as f:
+        first = next(f, None)
+        if first is None:
+            return
+        lines = f if _is_header(first) else itertools.chain([first], f)
+        while True:
+            block = [line for line in itertools.islice(lines, block_size) if line.strip()]
+            if not block:
+                return
+            yield np.loadtxt(block, delimiter=',', usecols=(0, 1), ndmin=2)
+
+
+def interarrival_blocks(path, block_size, timestamps=False, skip=0):
+    """Like read_blocks, with arrival timestamps turned into interarrival times (the first job arrives at time 0)
+    and the first `skip` records left out."""
+    previous = None
+    for block in read_blocks(path, block_size):
+        if timestamps:
+            times = block[:, 0].copy()
+            block[:, 0] = np.diff(times, prepend=times[0] if previous is None else previous)
+            previous = times[-1]
+        if skip:
+            dropped = min(skip, len(block))
+            block = block[dropped:]
+            skip -= dropped
+            if not len(block):
+                continue
+        yield block
+
+
+class TraceWorkload:
+    """Interarrival and service times of the jobs of a trace, read ahead in a background thread.
+
+    Interarrival times are divided by rate_scale, to replay the trace at a higher (or lower) load.
+    """
+
+    def __init__(self, path, timestamps=False, rate_scale=1.0, block_size=65_536, read_ahead=4, _skip=0):
+        self.path = path
+        self.timestamps = timestamps
+        self.rate_scale = rate_scale
+        self.block_size = block_size
+        self.read_ahead = read_ahead
+        self.consumed = _skip  # records handed out so far
+        self.next_job = 0  # id of the job the next record belongs to
+        self.pending = {}  # job id -> service time, for jobs that have arrived but not started service
+        self.interarrivals, self.services, self.index = [], [], 0
+        self.blocks = queue.Queue(maxsize=read_ahead)
+        self.reader = threading.Thread(target=self._read, args=(_skip,), daemon=True)
+        self.reader.start()
+
+    def _read(self, skip):
+        try:
+            for block in interarrival_blocks(self.path, self.block_size, self.timestamps, skip):
+                self.blocks.put(((block[:, 0] / self.rate_scale).tolist(), block[:, 1].tolist()))
+        except Exception as error:  # handed to the simulation thread, which raises it
+            self.blocks.put(error)
+        self.blocks.put(None)
+
+    def _next_block(self):
+        block = self.blocks.get()
+        if block is None:
+            self.blocks.put(None)  # the trace is over: keep answering None
+            return False
+        if isinstance(block, Exception):
+            raise block
+        self.interarrivals, self.services = block
+        self.index = 0
+        return True
+
+    def interarrival(self):
+        """The time until the next job arrives, or None at the end of the trace."""
+        if self.index == len(self.interarrivals) and not self._next_block():
+            return None
+        i = self.index
+        self.index += 1
+        self.consumed += 1
+        self.pending[self.next_job] = self.services[i]
+        self.next_job += 1
+        return self.interarrivals[i]
+
+    def service(self, job_id):
+        """The service time of a job that has arrived."""
+        return self.pending.pop(job_id)
+
+    def __getstate__(self):
+        """Pickled (e.g. in a checkpoint) as the position in the trace: the reader thread is restarted from there."""
+        return {'path': self.path, 'timestamps': self.timestamps, 'rate_scale': self.rate_scale,
+                'block_size': self.block_size, 'read_ahead': self.read_ahead, 'consumed': self.consumed,
+                'next_job': self.next_job, 'pending': self.pending}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['timestamps'], state['rate_scale'], state['block_size'],
+                      state['read_ahead'], _skip=state['consumed'])
+        self.next_job = state['next_job']
+        self.pending = state['pending']
+
+
+class GeneratedWorkload:
+    """Interarrival and service times of jobs drawn from two variates samplers, `block_size` jobs at a time."""
+
+    def __init__(self, interarrival, service, block_size=BLOCK_SIZE):
+        self.samplers = interarrival, service
+        self.block_size = block_size
+        self.next_job = 0  # id of the job the next interarrival time belongs to
+        self.pending = {}  # job id -> service time, for jobs that have arrived but not started service
+        self.interarrivals, self.services, self.index = [], [], 0
+
+    def draw(self):
+        """The (interarrival times, service times) arrays of the next block of jobs."""
+        interarrival, service = self.samplers
+        return interarrival.sample(self.block_size), service.sample(self.block_size)
+
+    def blocks(self):
+        """Block after block, the jobs drawn by draw(), for models that take them in bulk."""
+        while True:
+            yield self.draw()
+
+    def interarrival(self):
+        """The time until the next job arrives."""
+        if self.index == len(self.interarrivals):
+            interarrivals, services = self.draw()
+            self.interarrivals, self.services, self.index = interarrivals.tolist(), services.tolist(), 0
+        i = self.index
+        self.index += 1
+        self.pending[self.next_job] = self.services[i]
+        self.next_job += 1
+        return self.interarrivals[i]
+
+    def service(self, job_id):
+        """The service time of a job that has arrived."""
+        return self.pending.pop(job_id)
+
+    def reseed(self, rng):
+        """Draw from rng from now on (see checkpoint.reseed): the jobs drawn but not arrived yet are dropped, the jobs
+        that have arrived keep their service times."""
+        for sampler in self.samplers:
+            sampler.reseed(rng)
+        self.interarrivals, self.services, self.index = [], [], 0
+
+
+def add_workload_arguments(parser):
+    """Add the options replaying a trace in the MMN scripts."""
+    parser.add_argument('--workload', help="trace of interarrival and service times to replay (.csv, .csv.gz, .npy, "
+                                           ".bin), instead of generating them")
+    parser.add_argument('--timestamps', action='store_true',
+                        help="the first column of the trace holds arrival times, not interarrival times")
+    parser.add_argument('--rate-scale', type=float, default=1.0, help="replay the arrivals this many times faster")
+
+
+def workload_from_args(args):
+    """The TraceWorkload requested on the command line, or None."""
+    if args.workload is None:
+        return None
+    return TraceWorkload(args.workload, args.timestamps, args.rate_scale)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help="convert a trace to raw binary interarrival/service pairs")
+    convert.add_argument('source')
+    convert.add_argument('destination', help=".bin file")
+    convert.add_argument('--timestamps', action='store_true', help="the first column holds arrival times")
+    args = parser.parse_args()
+
+    jobs = 0
+    with open(args.destination, 'wb') as f:
+        for block in interarrival_blocks(args.source, 1 << 20, args.timestamps):
+            block.astype('<f8').tofile(f)
+            jobs += len(block)
+    print(f"{jobs} jobs written to {args.destination}")
+
+
+if __name__ == '__main__':
+    main()